@@ -1,2 +1,5 @@
 from .backtest_allocator import *
-from .backtest_trader import *
\ No newline at end of file
+from .backtest_trader import *
+from .parameter_sweep import *
+from .window_cache import *
+from .window_scheduler import *
\ No newline at end of file
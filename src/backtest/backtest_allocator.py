@@ -1,120 +1,260 @@
 import pandas as pd
 import numpy as np
-from dateutil.relativedelta import relativedelta
-from scipy.stats import gmean
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from scipy.sparse import csr_matrix, vstack
+from typing import Union
 
 from ..strategies import Strategy
+from ..utils import get_risk_free_rate, align_risk_free_rate, PricePanel
+from ..utils.metrics import PERIODS_PER_YEAR, batch_metrics
+from .window_cache import WindowCache
+from .window_scheduler import WindowScheduler
+
+_worker_strategy = None
+_worker_data = None
+
+def _init_allocator_worker(strategy: Strategy, data: Union[pd.DataFrame, PricePanel]) -> None:
+    # the strategy and prices are sent once per worker instead of once per window,
+    # a price panel is sent by path and memory-mapped by each worker
+    global _worker_strategy, _worker_data
+    _worker_strategy = strategy
+    _worker_data = data.to_frame() if isinstance(data, PricePanel) else data
+
+
+def _generate_portfolio_worker(start_row: int, end_row: int) -> dict:
+    return _worker_strategy.generate_portfolio(_worker_data.iloc[start_row:end_row])
+
 
 class BacktestAllocator:
     def __init__(
         self,
         strategy: Strategy,
-        data: pd.DataFrame,
+        data: Union[pd.DataFrame, PricePanel],
         trading_freq: str,
         fitting_window: int,
         fitting_window_units: str,
         starting_cash: float=10000,
+        cache_dir: str=None,
+        data_freq: str='D',
+        window_mode: str='rolling',
+        anchor_date: str=None,
+        schedule: WindowScheduler=None,
     ):
         """ Initializes a backtest object
 
         Args:
             strategy (Strategy): trading strategy to backtest
-            data (pd.DataFrame): historical price data of stocks
+            data (Union[pd.DataFrame, PricePanel]): historical price data of stocks. A memory-mapped panel
+                is read without loading it into memory and shared with process workers by path
             trading_freq (str): how often to trade (D, W, MS, YS)
             fitting_window (int): window size for fitting the model
             fitting_window_units (str): units for fitting window (days, months, years)
             starting_cash (float, optional): starting cash for the portfolio. Defaults to 10000.
+            cache_dir (str, optional): folder to cache the allocation of each window in. Interrupted or 
+                repeated runs only fit windows that are not cached. Defaults to None.
+            data_freq (str, optional): frequency of data (D, W, MS), to annualize the daily curve. Defaults to 'D'.
+            window_mode (str, optional): 'rolling', 'expanding' or 'anchored' fitting windows. Defaults to 'rolling'.
+            anchor_date (str, optional): first date of every fitting window in anchored mode. Defaults to None.
+            schedule (WindowScheduler, optional): precomputed windows for data, shared between backtests
+                of different strategies or parameters. Defaults to None (built from the arguments above).
         """
         self.strategy = strategy
+        self.panel = data if isinstance(data, PricePanel) else None
+        if self.panel is not None:
+            data = self.panel.to_frame()
         self.data = data
         self.trading_freq = trading_freq
         self.fitting_window = fitting_window
         self.fitting_window_units = fitting_window_units
         self.starting_cash = starting_cash
+        self.cache = WindowCache(cache_dir) if cache_dir is not None else None
+        self.data_freq = data_freq
+        if schedule is None:
+            schedule = WindowScheduler(
+                data.index, trading_freq, fitting_window, fitting_window_units, window_mode, anchor_date
+            )
+        self.schedule = schedule
         self.portfolios = []
         self.portfolio_values = [starting_cash]
         self.portfolio_returns = []
+        self.value_curve = pd.Series(dtype=float)
+        self.turnover = pd.Series(dtype=float)
         
-    def run_backtest(self):
+    def run_backtest(self, executor: str='serial', n_jobs: int=None):
+        """ Runs the backtest, fitting the strategy at every rebalance date
+            Windows are independent, so they can be fitted in parallel. Portfolios are
+            always stored in date order and match the serial run
+
+        Args:
+            executor (str, optional): 'serial', 'thread' or 'process'. Strategies that carry state
+                between windows (e.g. PCA_FA with arima_reselect_every > 1) must run serially. Defaults to 'serial'.
+            n_jobs (int, optional): number of workers. Defaults to None (one per CPU).
+        """
         print('Running backtest...')
         
-        delta_kwargs = {self.fitting_window_units: self.fitting_window}
-        start_date = self.data.index[0]
-        end_date = self.data.index[-1]
-        backtest_start_date = start_date + relativedelta(**delta_kwargs)
-        test_dates = pd.date_range(backtest_start_date, end_date, freq=self.trading_freq)
-        
-        # drop last date to avoid out of bounds error
-        for i, date in enumerate(test_dates[:-1]):
-            
-            # splice data for fitting
-            fit_start = (date - relativedelta(**delta_kwargs)).strftime('%Y-%m-%d')
-            fit_end = date.strftime('%Y-%m-%d')
-            fit_data = self.data.loc[fit_start:fit_end]
-            
-            allocation = self.strategy.generate_portfolio(fit_data)
-            
+        if executor not in ('serial', 'thread', 'process'):
+            raise ValueError("executor must be 'serial', 'thread' or 'process'")
+        if executor != 'serial' and self.strategy.stateful:
+            raise ValueError('Strategy carries state between windows, use executor="serial"')
+        if self.cache is not None and self.strategy.stateful:
+            raise ValueError('Strategy carries state between windows, its windows can not be cached')
+        
+        windows = self.schedule.windows
+        fit_starts = windows['fit_start'].tolist()
+        fit_ends = windows['fit_end'].tolist()
+        
+        # only fit windows that are not cached
+        cached = [None] * len(windows)
+        if self.cache is not None:
+            cached = [
+                self.cache.get(self.strategy, fit_start, fit_end, self.schedule.fit_data(self.data, i))
+                for i, (fit_start, fit_end) in enumerate(zip(fit_starts, fit_ends))
+            ]
+        missing = [i for i, allocation in enumerate(cached) if allocation is None]
+        missing_starts = windows['fit_start_row'].to_numpy()[missing].tolist()
+        missing_ends = windows['fit_end_row'].to_numpy()[missing].tolist()
+        
+        if executor == 'serial':
+            fitted = (
+                self.strategy.generate_portfolio(self.schedule.fit_data(self.data, i))
+                for i in missing
+            )
+            self._store_portfolios(self._merge_cached(cached, fitted))
+            return
+        
+        if executor == 'thread':
+            pool = ThreadPoolExecutor(max_workers=n_jobs)
+            fit = lambda start_row, end_row: self.strategy.generate_portfolio(self.data.iloc[start_row:end_row])
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=n_jobs, initializer=_init_allocator_worker, initargs=(self.strategy, self.panel if self.panel is not None else self.data)
+            )
+            fit = _generate_portfolio_worker
+        
+        # map returns results in date order
+        with pool:
+            fitted = pool.map(fit, missing_starts, missing_ends)
+            self._store_portfolios(self._merge_cached(cached, fitted))
+    
+    def _merge_cached(self, cached: list, fitted):
+        # yields allocations in date order, caching each fitted window as soon as it is done
+        fitted = iter(fitted)
+        windows = self.schedule.windows
+        for i, (fit_start, fit_end, allocation) in enumerate(zip(windows['fit_start'], windows['fit_end'], cached)):
+            if allocation is None:
+                allocation = next(fitted)
+                if self.cache is not None:
+                    self.cache.put(self.strategy, fit_start, fit_end, self.schedule.fit_data(self.data, i), allocation)
+                    
+            yield allocation
+    
+    def _store_portfolios(self, allocations) -> None:
+        windows = self.schedule.windows
+        for i, (fit_end, prediction_date, allocation) in enumerate(zip(windows['fit_end'], windows['prediction_date'], allocations)):
             self.portfolios.append({
                 'purchase_date': fit_end,
-                'prediction_date': test_dates[i+1].strftime('%Y-%m-%d'),
+                'prediction_date': prediction_date,
                 'portfolio': allocation
             })
-            print(f'Test {i+1}/{len(test_dates)-1} complete')
+            print(f'Test {i+1}/{len(windows)} complete')
     
-    def calculate_performance(self, risk_free_rate: pd.Series):
-        for portfolio in self.portfolios:
-            tickers = list(portfolio['portfolio'].keys())
-            weights = list(portfolio['portfolio'].values())
-            
-            # if no stocks selected, skip
-            if not tickers:
-                self.portfolio_values.append(self.portfolio_values[-1])
-                self.portfolio_returns.append(0)
-                continue
-            
-            holding_period = self.data.loc[
-                portfolio['purchase_date']:portfolio['prediction_date'], 
-                tickers
-            ]
-            start_price = holding_period.iloc[0]
-            end_price = holding_period.iloc[-1]
-            actual_returns = (end_price - start_price) / start_price
-            
-            self.portfolio_values.append(
-                self.portfolio_values[-1] * (1 + np.dot(weights, actual_returns))
-            )
-            
-            self.portfolio_returns.append(
-                np.dot(weights, actual_returns)
-            )
+    def _weight_matrix(self) -> csr_matrix:
+        # sparse (rebalance, ticker) weights, empty portfolios are empty rows
+        columns = {ticker: i for i, ticker in enumerate(self.data.columns)}
+        rows, cols, weights = [], [], []
+        for i, portfolio in enumerate(self.portfolios):
+            for ticker, weight in portfolio['portfolio'].items():
+                rows.append(i)
+                cols.append(columns[ticker])
+                weights.append(weight)
         
-        total_returns = (self.portfolio_values[-1] - self.portfolio_values[0]) / self.portfolio_values[0]
-        average_returns = gmean(np.array(self.portfolio_returns) + 1) - 1
-        
-        if self.trading_freq == 'D':
-            annual_returns = (1+average_returns)**252 - 1
-            annual_std = np.std(self.portfolio_returns) * np.sqrt(252)
-        elif self.trading_freq == 'W':
-            annual_returns = (1+average_returns)**52 - 1
-            annual_std = np.std(self.portfolio_returns) * np.sqrt(52)
-        elif self.trading_freq == 'MS':
-            annual_returns = (1+average_returns)**12 - 1
-            annual_std = np.std(self.portfolio_returns) * np.sqrt(12)
-        else:
-            annual_returns = average_returns
-            annual_std = np.std(self.portfolio_returns)
-            
-        sharpe_ratio = (annual_returns - risk_free_rate.mean()) / annual_std
+        return csr_matrix((weights, (rows, cols)), shape=(len(self.portfolios), len(columns)))
+    
+    def _mark_to_market(self) -> None:
+        # period returns, daily value curve and turnover from one pass over the weight matrix
+        weights = self._weight_matrix()
+        index = self.data.index
+        
+        # only the rows of the holding periods are read, straight from the panel if there is one
+        source = self.panel.prices if self.panel is not None else self.data.to_numpy(dtype=float)
+        prices = lambda rows: np.asarray(source[rows], dtype=float)
+        
+        # rows of each holding period, same as data.loc[purchase_date:prediction_date]
+        starts = index.searchsorted(pd.to_datetime([p['purchase_date'] for p in self.portfolios]), side='left')
+        ends = index.searchsorted(pd.to_datetime([p['prediction_date'] for p in self.portfolios]), side='right') - 1
+        
+        # a ticker's return from purchase to each date of its period, weighted (weights drift with prices)
+        days = [np.arange(start+1, end+1) for start, end in zip(starts, ends)]
+        day_period = np.repeat(np.arange(len(days)), [len(d) for d in days])
+        days = np.concatenate(days) if days else np.array([], dtype=int)
+        anchor = prices(starts[day_period])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            period_to_date = np.asarray(
+                weights[day_period].multiply((prices(days) - anchor) / anchor).sum(axis=1)
+            ).ravel()
+            start_prices = prices(starts)
+            end_returns = (prices(ends) - start_prices) / start_prices
+        
+        period_returns = np.asarray(weights.multiply(end_returns).sum(axis=1)).ravel()
+        values = self.starting_cash * np.cumprod(1 + period_returns)
+        self.portfolio_returns = period_returns.tolist()
+        self.portfolio_values = [self.starting_cash] + values.tolist()
+        
+        # daily mark to market value
+        value_before = np.concatenate([[self.starting_cash], values[:-1]])
+        self.value_curve = pd.concat([
+            pd.Series([self.starting_cash], index=index[starts[:1]]),
+            pd.Series(value_before[day_period] * (1 + period_to_date), index=index[days]),
+        ])
+        
+        # traded fraction of portfolio value: new weights vs last period's drifted weights
+        drifted = weights.multiply(1 + end_returns).multiply(1 / (1 + period_returns[:, None])).tocsr()
+        previous = vstack([csr_matrix((1, weights.shape[1])), drifted[:-1]])
+        self.turnover = pd.Series(
+            np.asarray(abs(weights - previous).sum(axis=1)).ravel(),
+            index=pd.to_datetime([p['purchase_date'] for p in self.portfolios]),
+        )
+    
+    def calculate_performance(self, risk_free_rate: pd.Series=None):
+        """ Calculates the performance of the backtested portfolios
+            Holdings are marked to market daily, with weights drifting with prices between rebalances
+
+        Args:
+            risk_free_rate (pd.Series, optional): annual risk-free rate. Downloaded if not given. Defaults to None.
+
+        Returns:
+            dict: performance statistics, value and return histories of the portfolio
+        """
+        if risk_free_rate is None:
+            risk_free_rate = get_risk_free_rate(self.data.index[0], self.data.index[-1])
+        risk_free_rate = align_risk_free_rate(risk_free_rate, self.data.index)
+        
+        self._mark_to_market()
+        
+        # period returns, annualized with the trading frequency
+        metrics = batch_metrics(self.portfolio_returns, PERIODS_PER_YEAR.get(self.trading_freq, 1), risk_free_rate.mean())
+        
+        # daily curve, annualized with the frequency of the data
+        daily_returns = self.value_curve.pct_change(fill_method=None).dropna()
+        daily_metrics = batch_metrics(daily_returns, PERIODS_PER_YEAR.get(self.data_freq, 1), risk_free_rate.mean())
         
         return {
             'total_portfolio_value': self.portfolio_values[-1],
-            'total_returns': total_returns,
-            'average_returns': average_returns,
-            'annual_returns': annual_returns,
-            'annual_std': annual_std,
-            'sharpe_ratio': sharpe_ratio,
+            'total_returns': (self.portfolio_values[-1] - self.portfolio_values[0]) / self.portfolio_values[0],
+            'average_returns': metrics['average_returns'][0],
+            'annual_returns': metrics['annual_returns'][0],
+            'annual_std': metrics['annual_std'][0],
+            'sharpe_ratio': metrics['sharpe_ratio'][0],
+            'sortino_ratio': metrics['sortino_ratio'][0],
+            'calmar_ratio': metrics['annual_returns'][0] / -daily_metrics['max_drawdown'][0],
+            'daily_annual_std': daily_metrics['annual_std'][0],
+            'max_drawdown': daily_metrics['max_drawdown'][0],
+            'max_drawdown_duration': daily_metrics['max_drawdown_duration'][0],
+            'average_turnover': self.turnover.mean(),
             'portfolio_history': self.portfolio_values,
             'returns_history': self.portfolio_returns,
+            'value_curve': self.value_curve,
+            'turnover': self.turnover,
             'portfolios': self.portfolios
         }
     
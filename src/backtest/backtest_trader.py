@@ -1,30 +1,324 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import gmean
-from typing import Tuple, List, Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Dict, Union, Iterator, List
 
 from ..strategies import Strategy
-from ..utils import plot_time_series, plot_dist, get_risk_free_rate, max_drawdown
+from ..utils import plot_time_series, plot_dist, get_risk_free_rate, align_risk_free_rate
+from ..utils.metrics import PERIODS_PER_YEAR, batch_metrics
+from ..utils.online_stats import RunningMoments, ReservoirQuantiles
+
+def _trade(signal, price: float, cash: float, shares_held: int, transaction_fee: float) -> Tuple[float, int]:
+    # update positions based on signals
+    if signal == 1:  # long
+        if shares_held < 0:  # exit short positions
+            cash -= np.abs(shares_held)*price + transaction_fee
+            shares_held = 0
+        
+        if shares_held == 0:  # long if not already long
+            max_shares = int((cash-transaction_fee) / price)
+            cash -= max_shares*price + transaction_fee
+            shares_held = max_shares
+
+    elif signal == -1:  # short
+        if shares_held > 0:  # exit long positions
+            cash += shares_held*price - transaction_fee
+            shares_held = 0
+        
+        if shares_held == 0:  # short if not already short
+            max_shares = -int((cash-transaction_fee) / price)
+            cash += np.abs(max_shares)*price - transaction_fee
+            shares_held = max_shares
+
+    elif signal == 0:  # exit positions
+        if shares_held != 0:
+            cash += shares_held * price - transaction_fee
+            shares_held = 0
+            
+    return cash, shares_held
+
+
+def _execute_signals(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    starting_cash: float,
+    transaction_fee: float,
+    daily_borrow_rate: float,
+) -> np.ndarray:
+    """ Runs the cash and position state machine of BacktestTrader over arrays
+        Trades are only checked where the signal changes (or the target position was not
+        reached); the days in between only accrue borrowing costs, computed per run
+
+    Args:
+        prices (np.ndarray): execution prices
+        signals (np.ndarray): signals for each price, 1: long, -1: short, 0: exit, otherwise hold
+        starting_cash (float): starting cash for trading
+        transaction_fee (float): cost per transaction
+        daily_borrow_rate (float): daily rate for borrowing (shorting)
+
+    Returns:
+        np.ndarray: portfolio value for each price
+    """
+    n = len(prices)
+    values = np.empty(n)
+    cash = starting_cash
+    shares_held = 0
+    
+    # runs of equal signals
+    bounds = np.concatenate([[0], np.flatnonzero(signals[1:] != signals[:-1]) + 1, [n]])
+    
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        signal = signals[start]
+        t = start
+        
+        # trade day by day until the signal's position is reached, e.g. a long
+        # signal without cash for a share keeps paying the fee
+        while t < end:
+            price = prices[t]
+            cash, shares_held = _trade(signal, price, cash, shares_held, transaction_fee)
+            
+            # pay borrowing costs for short positions
+            if shares_held < 0:
+                cash -= np.abs(shares_held)*price*daily_borrow_rate
+            values[t] = cash + shares_held*price
+            t += 1
+            
+            if not ((signal == 1 and shares_held <= 0) or (signal == -1 and shares_held >= 0)):
+                break
+        
+        if t == end:
+            continue
+        
+        # rest of the run holds the position
+        run_prices = prices[t:end]
+        if shares_held < 0:
+            # cumsum adds the costs one day at a time, same as the daily loop
+            costs = np.abs(shares_held)*run_prices*daily_borrow_rate
+            run_cash = np.cumsum(np.concatenate([[cash], -costs]))[1:]
+            values[t:end] = run_cash + shares_held*run_prices
+            cash = run_cash[-1]
+        else:
+            values[t:end] = cash + shares_held*run_prices
+    
+    return values
+
+
+def _affordable_shares(cash: np.ndarray, price: np.ndarray, transaction_fee: float, mask: np.ndarray) -> np.ndarray:
+    # int((cash-fee) / price) where mask is set, else 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.trunc((cash-transaction_fee) / price)
+    
+    return np.where(mask, shares, 0).astype(np.int64)
+
+
+def _trade_many(
+    signal: np.ndarray,
+    price: np.ndarray,
+    cash: np.ndarray,
+    shares_held: np.ndarray,
+    transaction_fee: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    # same steps as _trade, for many tickers at once
+    long = signal == 1
+    short = signal == -1
+    
+    # long: exit short positions, then long if not already long
+    exit_short = long & (shares_held < 0)
+    cash = np.where(exit_short, cash - (np.abs(shares_held)*price + transaction_fee), cash)
+    shares_held = np.where(exit_short, 0, shares_held)
+    
+    enter_long = long & (shares_held == 0)
+    max_shares = _affordable_shares(cash, price, transaction_fee, enter_long)
+    cash = np.where(enter_long, cash - (max_shares*price + transaction_fee), cash)
+    shares_held = np.where(enter_long, max_shares, shares_held)
+    
+    # short: exit long positions, then short if not already short
+    exit_long = short & (shares_held > 0)
+    cash = np.where(exit_long, cash + (shares_held*price - transaction_fee), cash)
+    shares_held = np.where(exit_long, 0, shares_held)
+    
+    enter_short = short & (shares_held == 0)
+    max_shares = -_affordable_shares(cash, price, transaction_fee, enter_short)
+    cash = np.where(enter_short, cash + (np.abs(max_shares)*price - transaction_fee), cash)
+    shares_held = np.where(enter_short, max_shares, shares_held)
+    
+    # exit positions
+    exit_all = (signal == 0) & (shares_held != 0)
+    cash = np.where(exit_all, cash + (shares_held*price - transaction_fee), cash)
+    shares_held = np.where(exit_all, 0, shares_held)
+    
+    return cash, shares_held
+
+
+def _execute_portfolio_signals(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    budgets: np.ndarray,
+    transaction_fee: float,
+    daily_borrow_rate: float,
+) -> np.ndarray:
+    """ Runs the cash and position state machine of BacktestTrader for every ticker at once
+        Each ticker trades its own budget in one pass over the dates. Trades are only checked
+        for tickers whose signal changed (or whose target position was not reached).
+        Dates with a missing price do not trade and value the position at the last known price
+
+    Args:
+        prices (np.ndarray): execution prices (dates, tickers)
+        signals (np.ndarray): signals (dates, tickers), 1: long, -1: short, 0: exit, otherwise hold
+        budgets (np.ndarray): starting cash of each ticker
+        transaction_fee (float): cost per transaction
+        daily_borrow_rate (float): daily rate for borrowing (shorting)
+
+    Returns:
+        np.ndarray: value of each ticker's cash and position (dates, tickers)
+    """
+    values = np.empty(prices.shape)
+    cash = np.asarray(budgets, dtype=float).copy()
+    shares_held = np.zeros(prices.shape[1], dtype=np.int64)
+    
+    valid = ~np.isnan(prices)
+    last_prices = pd.DataFrame(prices).ffill().fillna(0).to_numpy()
+    changed = np.ones(prices.shape, dtype=bool)
+    changed[1:] = signals[1:] != signals[:-1]
+    pending = np.zeros(prices.shape[1], dtype=bool)
+    
+    for t in range(len(prices)):
+        # tickers that may trade today
+        active = np.flatnonzero((changed[t] | pending) & valid[t])
+        
+        # scalar trades are cheaper for a few tickers, array trades for many
+        if len(active) > 16:
+            signal = signals[t, active]
+            cash[active], shares_held[active] = _trade_many(
+                signal, prices[t, active], cash[active], shares_held[active], transaction_fee
+            )
+        else:
+            for i in active:
+                cash[i], shares_held[i] = _trade(
+                    signals[t, i], prices[t, i], cash[i], int(shares_held[i]), transaction_fee
+                )
+            signal = signals[t, active]
+        
+        # e.g. a long signal without cash for a share trades (and pays the fee) again tomorrow
+        shares = shares_held[active]
+        pending[active] = ((signal == 1) & (shares <= 0)) | ((signal == -1) & (shares >= 0))
+        
+        # signals on dates without prices trade at the next price
+        pending |= changed[t] & ~valid[t]
+        
+        # pay borrowing costs for short positions
+        short = shares_held < 0
+        if short.any():
+            cash[short] -= np.abs(shares_held[short])*last_prices[t, short]*daily_borrow_rate
+        values[t] = cash + shares_held*last_prices[t]
+    
+    return values
+
+
+def _execute_pair_signals(
+    prices: np.ndarray,
+    signals: np.ndarray,
+    budgets: np.ndarray,
+    hedge_ratios: np.ndarray,
+    transaction_fee: float,
+    daily_borrow_rate: float,
+) -> np.ndarray:
+    """ Runs the cash and position state machine of BacktestTrader for hedged pairs, every pair at once
+        Each pair trades as one position: n shares of y and -hedge_ratio*n shares of x, with n sized
+        from the cash of both legs. Each leg keeps its own cash, so the legs' values add up to the pair's.
+        Dates with a missing price in either leg do not trade and value the legs at their last known price
+
+    Args:
+        prices (np.ndarray): execution prices (dates, pairs, 2), y then x
+        signals (np.ndarray): signals of y (dates, pairs), 1: long spread, -1: short spread, 0: exit, otherwise hold
+        budgets (np.ndarray): starting cash of each leg (pairs, 2)
+        hedge_ratios (np.ndarray): shares of x hedging one share of y (pairs)
+        transaction_fee (float): cost per transaction, paid by each leg that trades
+        daily_borrow_rate (float): daily rate for borrowing (shorting)
+
+    Returns:
+        np.ndarray: value of each leg's cash and position (dates, pairs, 2)
+    """
+    n_dates, n_pairs, _ = prices.shape
+    values = np.empty(prices.shape)
+    cash = np.asarray(budgets, dtype=float).copy()
+    shares_held = np.zeros((n_pairs, 2), dtype=np.int64)
+    legs = np.stack([np.ones(n_pairs), -np.asarray(hedge_ratios, dtype=float)], axis=1)
+    
+    valid = ~np.isnan(prices).any(axis=2)
+    last_prices = pd.DataFrame(prices.reshape(n_dates, -1)).ffill().fillna(0).to_numpy().reshape(prices.shape)
+    
+    for t in range(n_dates):
+        # pairs whose position differs from the signal, e.g. a long signal without cash trades again tomorrow
+        signal = signals[t]
+        trade = valid[t] & np.isin(signal, (1, -1, 0)) & (signal != np.sign(shares_held[:, 0]))
+        
+        if trade.any():
+            price = prices[t, trade]
+            held = shares_held[trade]
+            
+            # close both legs, then open the pair in the direction of the signal
+            pair_cash = cash[trade] + np.where(held != 0, held*price - transaction_fee, 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                size = np.trunc((pair_cash.sum(axis=1) - 2*transaction_fee) / (np.abs(legs[trade])*price).sum(axis=1))
+            size = np.where(signal[trade] != 0, np.nan_to_num(np.maximum(size, 0)), 0)
+            
+            held = np.rint(signal[trade, None]*size[:, None]*legs[trade]).astype(np.int64)
+            pair_cash -= np.where(held != 0, held*price + transaction_fee, 0)
+            cash[trade] = pair_cash
+            shares_held[trade] = held
+        
+        # pay borrowing costs for short legs
+        short = shares_held < 0
+        if short.any():
+            cash[short] -= np.abs(shares_held[short])*last_prices[t][short]*daily_borrow_rate
+        values[t] = cash + shares_held*last_prices[t]
+    
+    return values
+
+
+_worker_trader = None
+
+def _init_bootstrap_worker(trader) -> None:
+    # the trader is sent once per worker instead of once per batch
+    global _worker_trader
+    _worker_trader = trader
+
+
+def _bootstrap_batch_worker(seed: np.random.SeedSequence, n_iterations: int, block_size: int) -> Dict[str, np.ndarray]:
+    return _worker_trader._bootstrap_batch(seed, n_iterations, block_size)
+
 
 class BacktestTrader:
     def __init__(
         self,
         strategy: Strategy,
-        data: pd.Series,
+        data: Union[pd.Series, pd.DataFrame],
         data_freq: str='D',
         starting_cash: float=10000,
         transaction_fee: float=10,
         borrow_rate: float=0.02,
+        risk_free_rate: pd.Series=None,
+        allocation: Union[str, Dict[str, float]]='equal',
+        signals: Union[pd.Series, pd.DataFrame]=None,
     ):
         """ Initializes a BacktestTrader object
+            Passing a (dates, tickers) panel backtests every ticker at once (portfolio mode),
+            each ticker trading its own share of the starting cash
 
         Args:
-            strategy (Strategy): trading strategy to backtest
-            data (pd.Series): historical price data of stock
+            strategy (Strategy): trading strategy to backtest, None if signals are given
+            data (Union[pd.Series, pd.DataFrame]): historical price data of stock, or (dates, tickers) panel of stocks
             data_freq (str, optional): frequency of data. Defaults to 'D'.
             starting_cash (float, optional): starting cash for trading. Defaults to 10000.
             transaction_fee (float, optional): cost per transaction. Defaults to 10.
             borrow_rate (float, optional): annual rate for borrowing (shorting). Defaults to 0.02.
+            risk_free_rate (pd.Series, optional): annual risk-free rate. Downloaded once if not given. Defaults to None.
+            allocation (Union[str, Dict[str, float]], optional): portfolio mode only, 'equal' splits the 
+                starting cash equally, or {ticker: budget} (unallocated cash stays idle). Defaults to 'equal'.
+            signals (Union[pd.Series, pd.DataFrame], optional): precomputed signals for data, 
+                instead of the strategy's. Defaults to None.
         """
         self.strategy = strategy
         self.data = data
@@ -32,62 +326,107 @@ class BacktestTrader:
         self.starting_cash = starting_cash
         self.transaction_fee = transaction_fee
         self.borrow_rate = borrow_rate
+        self.risk_free_rate = risk_free_rate
+        self.allocation = allocation
+        self.signals = signals
         self.portfolio_value = pd.Series(dtype=float)
         self.portfolio_returns = pd.Series(dtype=float)
+        self.ticker_values = pd.DataFrame(dtype=float)
+        self.ticker_returns = pd.DataFrame(dtype=float)
         self.bootstrap_results = pd.DataFrame(index=['mean', 'se', '95 upper', '95 lower'])
   
                      
-    def _calculate_performance(self, price_data: pd.Series) -> Tuple[pd.Series, pd.Series]:
-        signals = self.strategy.generate_signals(price_data)
-        
-        cash = self.starting_cash
-        daily_borrow_rate = self.borrow_rate/252
-        shares_held = 0
-        portfolio_values = []
-        
-        for date in self.data.index:
-            signal = signals.loc[date]
-            price = self.data.loc[date]
-
-            # update positions based on signals and weights
-            if signal == 1:  # long
-                if shares_held < 0:  # exit short positions
-                    cash -= np.abs(shares_held)*price + self.transaction_fee
-                    shares_held = 0
-                
-                if shares_held == 0:  # long if not already long
-                    max_shares = int((cash-self.transaction_fee) / price)
-                    cash -= max_shares*price + self.transaction_fee
-                    shares_held = max_shares
-
-            elif signal == -1:  # short
-                if shares_held > 0:  # exit long positions
-                    cash += shares_held*price - self.transaction_fee
-                    shares_held = 0
-                
-                if shares_held == 0:  # short if not already short
-                    max_shares = -int((cash-self.transaction_fee) / price)
-                    cash += np.abs(max_shares)*price - self.transaction_fee
-                    shares_held = max_shares
-
-            elif signal == 0:  # exit positions
-                if shares_held != 0:
-                    cash += shares_held * price - self.transaction_fee
-                    shares_held = 0
-
-            # pay borrowing costs for short positions
-            if shares_held < 0:
-                cash -= np.abs(shares_held)*price*daily_borrow_rate
+    def _get_risk_free_rate(self) -> pd.Series:
+        # resolve once and reuse for every call to _calculate_stats
+        if self.risk_free_rate is None:
+            self.risk_free_rate = get_risk_free_rate(self.data.index[0], self.data.index[-1])
+        
+        if not self.risk_free_rate.index.equals(self.data.index):
+            self.risk_free_rate = align_risk_free_rate(self.risk_free_rate, self.data.index)
             
-            # Calculate total portfolio value (cash + current stock holdings)
-            portfolio_values.append(cash + shares_held*price)
+        return self.risk_free_rate
+    
+    
+    def _get_signals(self, price_data: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+        if self.signals is not None and price_data is self.data:
+            return self.signals
+        
+        return self.strategy.generate_signals(price_data)
+    
+    
+    def _get_budgets(self) -> np.ndarray:
+        # starting cash of each ticker in portfolio mode
+        tickers = self.data.columns
+        if self.allocation == 'equal':
+            return np.full(len(tickers), self.starting_cash/len(tickers))
+        
+        budgets = pd.Series(self.allocation, dtype=float).reindex(tickers).fillna(0)
+        if budgets.sum() > self.starting_cash:
+            raise ValueError('Budgets of tickers exceed the starting cash')
+        
+        return budgets.to_numpy()
+    
+    
+    def _calculate_performance(self, price_data: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        signals = self._get_signals(price_data)
+        
+        # trade at the prices the signals were generated from
+        values = _execute_signals(
+            price_data.to_numpy(dtype=float),
+            np.asarray(signals.reindex(price_data.index)),
+            self.starting_cash,
+            self.transaction_fee,
+            self.borrow_rate/252,
+        )
 
-        # Convert the portfolio values to a series after the loop
-        portfolio_values = pd.Series(portfolio_values, index=self.data.index)
+        portfolio_values = pd.Series(values, index=price_data.index)
         # Calculate daily returns
         portfolio_returns = portfolio_values.pct_change(fill_method=None).dropna()
 
         return portfolio_values, portfolio_returns
+    
+    
+    def _calculate_portfolio_performance(self, price_data: pd.DataFrame) -> pd.DataFrame:
+        signals = self._get_signals(price_data)
+        budgets = self._get_budgets()
+        
+        # tickers without a budget do not trade
+        signals = signals.reindex(index=price_data.index, columns=price_data.columns).to_numpy(dtype=float)
+        signals[:, budgets <= 0] = np.nan
+        prices = price_data.to_numpy(dtype=float)
+        
+        # hedged pairs trade together, their legs are left out of the per-ticker run
+        pairs = self.strategy.pair_legs(price_data) if self.strategy is not None else None
+        if pairs is not None and not pairs.empty:
+            y = price_data.columns.get_indexer(pairs['y'])
+            x = price_data.columns.get_indexer(pairs['x'])
+            pair_signals = signals[:, y]
+            signals[:, y] = signals[:, x] = np.nan
+        
+        values = _execute_portfolio_signals(
+            prices,
+            signals,
+            budgets,
+            self.transaction_fee,
+            self.borrow_rate/252,
+        )
+        
+        if pairs is not None and not pairs.empty:
+            legs = np.stack([y, x], axis=1)
+            # a pair only trades if both legs have a budget
+            pair_signals[:, (budgets[legs] <= 0).any(axis=1)] = np.nan
+            pair_values = _execute_pair_signals(
+                prices[:, legs],
+                pair_signals,
+                budgets[legs],
+                pairs['hedge_ratio'].to_numpy(dtype=float),
+                self.transaction_fee,
+                self.borrow_rate/252,
+            )
+            values[:, y] = pair_values[:, :, 0]
+            values[:, x] = pair_values[:, :, 1]
+        
+        return pd.DataFrame(values, index=price_data.index, columns=price_data.columns)
 
 
     def _stationary_bootstrap(
@@ -95,61 +434,84 @@ class BacktestTrader:
         initial_price: float, 
         returns_data: pd.Series, 
         n_iterations: int, 
-        block_size: int
-    ) -> List[List[float]]:
+        block_size: int,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
         data_len = len(returns_data)
-        bootstrap_samples = []
         
-        for _ in range(n_iterations):
-            sample = []
-            i = np.random.randint(0, data_len)
-            
-            while len(sample) < data_len:
-                sample.append(returns_data.iloc[i])
+        # a new block starts with probability 1/block_size, at a random index
+        block_starts = rng.integers(0, data_len, size=(n_iterations, data_len))
+        new_block = rng.random((n_iterations, data_len)) < 1/block_size
+        new_block[:, 0] = True
+        
+        # each value continues the last block started before it
+        steps = np.arange(data_len)
+        last_start = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+        block_offset = steps - last_start
+        indices = (np.take_along_axis(block_starts, last_start, axis=1) + block_offset) % data_len
+        
+        # reconstruct price series
+        sample_returns = returns_data.to_numpy()[indices]
+        sample_prices = np.empty((n_iterations, data_len+1))
+        sample_prices[:, 0] = initial_price
+        sample_prices[:, 1:] = initial_price*np.cumprod(1+sample_returns, axis=1)
+        
+        return sample_prices
+    
+    
+    def _bootstrap_batch(self, seed: np.random.SeedSequence, n_iterations: int, block_size: int) -> Dict[str, np.ndarray]:
+        # stats of one batch of bootstrap samples, backtested together as a panel
+        initial_price = self.data.iloc[0]
+        returns = self.data.pct_change(fill_method=None).dropna()
+        samples = self._stationary_bootstrap(
+            initial_price, returns, n_iterations, block_size, np.random.default_rng(seed)
+        )
+        samples = pd.DataFrame(samples.T, index=self.data.index)
+        
+        signals = self.strategy.generate_signals(samples)
+        values = _execute_portfolio_signals(
+            samples.to_numpy(),
+            np.asarray(signals, dtype=float),
+            np.full(n_iterations, float(self.starting_cash)),
+            self.transaction_fee,
+            self.borrow_rate/252,
+        )
+        sample_returns = values[1:] / values[:-1] - 1
+        
+        return self._calculate_stats(sample_returns)
+    
+    
+    def _iter_bootstrap_batches(
+        self,
+        seeds: List[np.random.SeedSequence],
+        batch_sizes: List[int],
+        block_size: int,
+        n_jobs: int
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        # yields the stats of each batch in order, samples are discarded after each batch
+        if n_jobs == 1 or len(batch_sizes) <= 1:
+            for batch_seed, n in zip(seeds, batch_sizes):
+                yield self._bootstrap_batch(batch_seed, n, block_size)
+            return
+        
+        # keep a few batches per worker in flight
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_bootstrap_worker, initargs=(self,)) as executor:
+            pending = deque()
+            for batch_seed, n in zip(seeds, batch_sizes):
+                pending.append(executor.submit(_bootstrap_batch_worker, batch_seed, n, block_size))
                 
-                if np.random.rand() < 1/block_size:
-                    i = np.random.randint(0, data_len) # new block
-                else:
-                    i = (i+1) % data_len # same next value in block
+                if len(pending) >= 2*n_jobs:
+                    yield pending.popleft().result()
             
-            # reconstruct price series
-            sample_prices = [initial_price]
-            sample_prices.extend(np.cumprod(1+np.array(sample)))
-            bootstrap_samples.append(sample_prices)
-        
-        return bootstrap_samples
-
-
-    def _calculate_stats(self, returns_data: pd.Series) -> Dict[str, float]:
-        average_returns = gmean(np.array(returns_data)+1)-1
-        risk_free_rate = get_risk_free_rate(self.data.index[0], self.data.index[-1])
-        
-        if self.data_freq == 'D':
-            annual_returns = (1+average_returns)**252 - 1
-            annual_std = np.std(returns_data) * np.sqrt(252)
-        elif self.data_freq == 'W':
-            annual_returns = (1+average_returns)**52 - 1
-            annual_std = np.std(returns_data) * np.sqrt(52)
-        elif self.data_freq == 'MS':
-            annual_returns = (1+average_returns)**12 - 1
-            annual_std = np.std(returns_data) * np.sqrt(12)
-        else:
-            annual_returns = average_returns
-            annual_std = np.std(returns_data)
-        
-        sharpe_ratio = (annual_returns - risk_free_rate.mean()) / annual_std
-        skew = returns_data.skew()
-        kurtosis = returns_data.kurtosis()
+            while pending:
+                yield pending.popleft().result()
+
+
+    def _calculate_stats(self, returns_data: Union[pd.Series, pd.DataFrame]) -> Dict[str, np.ndarray]:
+        # stats of every column at once
+        risk_free_rate = self._get_risk_free_rate()
         
-        return {
-            'average_returns': average_returns,
-            'annual_returns': annual_returns,
-            'annual_std': annual_std,
-            'sharpe_ratio': sharpe_ratio,
-            'skew': skew,
-            'kurtosis': kurtosis,
-            'max_drawdown': max_drawdown(returns_data),
-        }
+        return batch_metrics(returns_data, PERIODS_PER_YEAR.get(self.data_freq, 1), risk_free_rate.mean())
         
     
     def _check_backtest_ran(self) -> None:
@@ -160,39 +522,75 @@ class BacktestTrader:
     def run_backtest(self) -> None:
         """ Runs the backtest using the strategy and data provided
         """
-        values, returns = self._calculate_performance(self.data)
+        if isinstance(self.data, pd.DataFrame):
+            self.ticker_values = self._calculate_portfolio_performance(self.data)
+            self.ticker_returns = self.ticker_values.pct_change(fill_method=None).iloc[1:]
+            
+            # idle cash is part of the portfolio
+            idle_cash = self.starting_cash - self._get_budgets().sum()
+            values = self.ticker_values.sum(axis=1) + idle_cash
+            returns = values.pct_change(fill_method=None).dropna()
+        else:
+            values, returns = self._calculate_performance(self.data)
+            
         self.portfolio_value = values
         self.portfolio_returns = returns
         
         
-    def run_bootstrap(self, n_iterations: int=1000, block_size: int=10) -> pd.DataFrame:
+    def run_bootstrap(
+        self, 
+        n_iterations: int=1000, 
+        block_size: int=10,
+        seed: int=None,
+        batch_size: int=100,
+        n_jobs: int=1,
+        quantile_sample_size: int=10000,
+    ) -> pd.DataFrame:
         """ Runs a stationary bootstrap on the backtest results
+            Samples are backtested in batches, each batch drawing from its own random stream,
+            so results for a given seed do not depend on n_jobs. Statistics are accumulated
+            online, so memory does not grow with n_iterations
 
         Args:
             n_iterations (int, optional): Number of bootstrap iterations. Defaults to 1000.
             block_size (int, optional): Expected length of bootstrap block. Defaults to 10.
+            seed (int, optional): seed for reproducible samples. Defaults to None.
+            batch_size (int, optional): samples backtested together. Defaults to 100.
+            n_jobs (int, optional): processes to run batches in. Defaults to 1 (no pool).
+            quantile_sample_size (int, optional): samples kept to estimate the confidence intervals.
+                Intervals are exact up to this many iterations. Defaults to 10000.
 
         Returns:
             pd.DataFrame: dataframe of statistics from the bootstrap
         """
-        initial_price = self.data.iloc[0]
-        returns = self.data.pct_change(fill_method=None).dropna()
-        samples = self._stationary_bootstrap(initial_price, returns, n_iterations, block_size)
-        sample_stats = {}
+        if isinstance(self.data, pd.DataFrame):
+            raise ValueError('Bootstrap is only available for a single stock')
+        # samples are backtested together as the columns of one panel
+        if not self.strategy.independent_columns:
+            raise ValueError('Bootstrap needs a strategy that trades each column independently')
         
-        for sample in samples:
-            _, sample_returns = self._calculate_performance(
-                pd.Series(sample, index=self.data.index)
-            )
-            stats = self._calculate_stats(sample_returns)
-            
-            for key, value in stats.items():
-                sample_stats.setdefault(key, []).append(value)
+        # resolve once, before copies are sent to workers
+        self._get_risk_free_rate()
+        
+        batch_sizes = [min(batch_size, n_iterations-i) for i in range(0, n_iterations, batch_size)]
+        # one random stream per batch, and one for the quantile samples
+        *seeds, quantile_seed = np.random.SeedSequence(seed).spawn(len(batch_sizes) + 1)
+        
+        moments = {}
+        quantiles = {}
+        for batch_stats in self._iter_bootstrap_batches(seeds, batch_sizes, block_size, n_jobs):
+            for key, value in batch_stats.items():
+                if key not in moments:
+                    moments[key] = RunningMoments()
+                    quantiles[key] = ReservoirQuantiles(quantile_sample_size, quantile_seed.spawn(1)[0])
+                    
+                moments[key].update(value)
+                quantiles[key].update(value)
             
-        for key, value in sample_stats.items():
-            ci = np.percentile(value, [2.5, 97.5])
-            self.bootstrap_results.loc['mean', key] = np.mean(value)
-            self.bootstrap_results.loc['se', key] = np.std(value, ddof=1)
+        for key in moments:
+            ci = quantiles[key].quantile([2.5, 97.5])
+            self.bootstrap_results.loc['mean', key] = moments[key].mean
+            self.bootstrap_results.loc['se', key] = moments[key].std(ddof=1)
             self.bootstrap_results.loc['95 lower', key] = ci[0]
             self.bootstrap_results.loc['95 upper', key] = ci[1]
         
@@ -205,9 +603,9 @@ class BacktestTrader:
         Returns:
             Dict[str, float]: backtest results
         """
-        self._check_backtest_ran
+        self._check_backtest_ran()
         
-        stats = self._calculate_stats(self.portfolio_returns)
+        stats = {key: value[0] for key, value in self._calculate_stats(self.portfolio_returns).items()}
         stats['total_returns'] = (self.portfolio_value.iloc[-1]-self.starting_cash)/self.starting_cash
         stats['portfolio_value'] = self.portfolio_value.iloc[-1]
         
@@ -221,8 +619,21 @@ class BacktestTrader:
             Tuple[pd.Series, pd.Series]: Backtested portfolio value and returns
         """
         
-        self._check_backtest_ran
+        self._check_backtest_ran()
         return self.portfolio_value, self.portfolio_returns
+    
+    
+    def get_ticker_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """ Gets the backtested value and returns of each ticker in portfolio mode
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Backtested value and returns (dates, tickers)
+        """
+        self._check_backtest_ran()
+        if self.ticker_values.empty:
+            raise ValueError('Ticker data is only available for a (dates, tickers) panel')
+        
+        return self.ticker_values, self.ticker_returns
         
 
     def plot_results(self, title: str='Backtest Results') -> None:
@@ -231,7 +642,7 @@ class BacktestTrader:
         Args:
             title (str, optional): title of plot. Defaults to 'Backtest Results'.
         """
-        self._check_backtest_ran
+        self._check_backtest_ran()
         plot_time_series(
             self.portfolio_value,
             title=title,
@@ -246,7 +657,7 @@ class BacktestTrader:
             title (str, optional): title of plots. Defaults to 'Backtest Returns Distribution'.
             hist_bins (int, optional): number of bins for histogram. Defaults to 50.
         """
-        self._check_backtest_ran
+        self._check_backtest_ran()
         plot_dist(
             self.portfolio_returns,
             title=title,
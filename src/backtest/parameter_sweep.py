@@ -0,0 +1,178 @@
+import pandas as pd
+import numpy as np
+from typing import Iterator, List, Tuple
+
+from ..strategies.moving_averages import ewm_state, ewm_update, span_to_alpha
+from ..utils.metrics import PERIODS_PER_YEAR
+from ..utils.online_stats import RollingMoments, RunningDrawdown
+
+def _crossover_positions(
+    short_ma: np.ndarray,
+    long_ma: np.ndarray,
+    enable_shorting: bool,
+    tolerance: float
+) -> np.ndarray:
+    # SMAs are differences of one cumulative sum, so averages that are equal in exact arithmetic
+    # (e.g. over flat prices) can differ by rounding and would flip positions on noise. Relative
+    # differences within the tolerance count as equal. EWMs follow the same recursion as pandas
+    # ewm().mean() in generate_signals, so they are compared exactly (tolerance 0)
+    tolerance = tolerance * np.abs(long_ma)
+    difference = short_ma - long_ma
+    positions = (difference > tolerance).astype(np.int8)
+    if enable_shorting:
+        positions -= difference < -tolerance
+
+    return positions
+
+
+def _moving_average_rows(values: np.ndarray, windows: np.ndarray, kind: str) -> Iterator[np.ndarray]:
+    # moving averages of every window at each date (windows, tickers), from one cumulative sum
+    # (sma) or one recursion (ewm), so no (dates, tickers) array is kept per window
+    if kind == 'ewm':
+        alpha = span_to_alpha(windows)[:, None]
+        state = ewm_state((len(windows), values.shape[1]))
+        for row in values:
+            yield ewm_update(state, row, alpha)
+        return
+
+    valid = ~np.isnan(values)
+    complete = valid.all()
+    zeros = np.zeros((1, values.shape[1]))
+    cum_prices = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0), axis=0)])
+    if not complete:
+        cum_counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    for t in range(len(values)):
+        start = t + 1 - windows
+        ready = start >= 0
+        rows = np.full((len(windows), values.shape[1]), np.nan)
+        sums = cum_prices[t+1] - cum_prices[start[ready]]
+        rows[ready] = sums / windows[ready, None]
+        if not complete:
+            # a window with a missing price is NaN, matching pandas rolling().mean()
+            counts = cum_counts[t+1] - cum_counts[start[ready]]
+            rows[ready] = np.where(counts == windows[ready, None], rows[ready], np.nan)
+
+        yield rows
+
+
+def _sweep_batch(
+    values: np.ndarray,
+    asset_returns: np.ndarray,
+    window_pairs: List[Tuple[int, int]],
+    kind: str,
+    enable_shorting: bool,
+    transaction_cost: float,
+    borrow_cost: float,
+) -> Tuple[RollingMoments, RunningDrawdown, np.ndarray, np.ndarray]:
+    # one pass over the dates, updating every (pair, ticker) at once
+    windows, index = np.unique(np.array(window_pairs, dtype=int), return_inverse=True)
+    index = index.reshape(-1, 2)
+    size = len(window_pairs) * values.shape[1]
+
+    moments = RollingMoments()
+    drawdown = RunningDrawdown()
+    log_growth = np.zeros(size)
+    n_trades = np.zeros(size, dtype=int)
+    previous = np.zeros((len(window_pairs), values.shape[1]), dtype=np.int8)
+
+    tolerance = 1e-12 if kind == 'sma' else 0.0
+    for t, averages in enumerate(_moving_average_rows(values, windows, kind)):
+        positions = _crossover_positions(averages[index[:, 0]], averages[index[:, 1]], enable_shorting, tolerance)
+
+        # yesterday's position earns today's return, trades pay costs
+        if t > 0:
+            strategy_returns = previous * asset_returns[t]
+            if transaction_cost:
+                strategy_returns -= transaction_cost * np.abs(positions - previous)
+            if enable_shorting and borrow_cost:
+                strategy_returns -= borrow_cost * (positions < 0)
+
+            strategy_returns = strategy_returns.ravel()
+            moments.update(strategy_returns)
+            drawdown.update(strategy_returns)
+            log_growth += np.log1p(strategy_returns)
+            n_trades += (positions != previous).ravel()
+
+        previous = positions
+
+    return moments, drawdown, log_growth, n_trades
+
+
+def sweep_moving_averages(
+    prices: pd.DataFrame,
+    window_pairs: List[Tuple[int, int]],
+    kind: str='sma',
+    enable_shorting: bool=False,
+    data_freq: str='D',
+    transaction_cost: float=0.0,
+    borrow_rate: float=0.02,
+    risk_free_rate: float=0.0,
+    by_ticker: bool=False,
+    batch_size: int=1000,
+) -> pd.DataFrame:
+    """ Backtests a moving average crossover strategy (SMAC or EWMAC) for a grid of
+        (short_window, long_window) pairs on every ticker of a price panel at once.
+        Each batch of pairs is backtested in one pass over the dates, updating every pair
+        and ticker together: moving averages come from one cumulative sum (or recursion)
+        shared across pairs, and metrics are accumulated online.
+        Positions follow the signal at each close and earn the next period's return
+
+    Args:
+        prices (pd.DataFrame): historical prices (dates, tickers)
+        window_pairs (List[Tuple[int, int]]): (short_window, long_window) pairs to test
+        kind (str, optional): 'sma' for SMAC or 'ewm' for EWMAC. Defaults to 'sma'.
+        enable_shorting (bool, optional): short when short average < long average. Defaults to False.
+        data_freq (str, optional): frequency of data (D, W, MS). Defaults to 'D'.
+        transaction_cost (float, optional): cost of each trade as a fraction of position value. Defaults to 0.0.
+        borrow_rate (float, optional): annual rate for borrowing (shorting). Defaults to 0.02.
+        risk_free_rate (float, optional): annual risk-free rate for the sharpe ratio. Defaults to 0.0.
+        by_ticker (bool, optional): return metrics per ticker instead of averaged over tickers. Defaults to False.
+        batch_size (int, optional): pairs backtested together. Defaults to 1000.
+
+    Returns:
+        pd.DataFrame: metrics for each (short_window, long_window) pair (and ticker)
+    """
+    if kind not in ('sma', 'ewm'):
+        raise ValueError("kind must be 'sma' or 'ewm'")
+
+    values = prices.to_numpy(dtype=float)
+    periods_per_year = PERIODS_PER_YEAR.get(data_freq, 1)
+
+    asset_returns = np.zeros(values.shape)
+    asset_returns[1:] = values[1:] / values[:-1] - 1
+    asset_returns = np.nan_to_num(asset_returns)
+    borrow_cost = borrow_rate / periods_per_year
+
+    results = []
+    for i in range(0, len(window_pairs), batch_size):
+        pairs = list(window_pairs[i:i+batch_size])
+        moments, drawdown, log_growth, n_trades = _sweep_batch(
+            values, asset_returns, pairs, kind, enable_shorting, transaction_cost, borrow_cost
+        )
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average_returns = np.exp(log_growth / moments.count) - 1
+            annual_returns = (1+average_returns)**periods_per_year - 1
+            annual_std = moments.std() * np.sqrt(periods_per_year)
+            sharpe_ratio = (annual_returns - risk_free_rate) / annual_std
+
+        results.append(pd.DataFrame({
+            'short_window': np.repeat([pair[0] for pair in pairs], values.shape[1]),
+            'long_window': np.repeat([pair[1] for pair in pairs], values.shape[1]),
+            'ticker': np.tile(prices.columns, len(pairs)),
+            'total_returns': drawdown.growth - 1,
+            'average_returns': average_returns,
+            'annual_returns': annual_returns,
+            'annual_std': annual_std,
+            'sharpe_ratio': sharpe_ratio,
+            'max_drawdown': drawdown.max_drawdown,
+            'n_trades': n_trades,
+        }))
+
+    results = pd.concat(results, ignore_index=True)
+
+    if by_ticker:
+        return results.set_index(['short_window', 'long_window', 'ticker'])
+
+    return results.drop(columns='ticker').groupby(['short_window', 'long_window'], sort=False).mean()
@@ -0,0 +1,197 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+from ..strategies import Strategy
+
+def _update_digest(digest, value) -> None:
+    # hash values by content, dataframes without pickling
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        labels = value.columns.tolist() if isinstance(value, pd.DataFrame) else value.name
+        digest.update(repr(labels).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.shape, value.dtype)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        digest.update(repr(value).encode())
+    else:
+        # a default repr holds a memory address, so the key would change on every run
+        raise TypeError(f'Can not hash a {type(value).__name__} by content, leave it out of cache_params()')
+
+
+def strategy_key(strategy: Strategy) -> str:
+    """ Key of a strategy's parameters: its class and Strategy.cache_params().
+        Private attributes (e.g. fitted caches), data and runtime settings are ignored
+
+    Args:
+        strategy (Strategy): strategy to identify
+
+    Returns:
+        str: key of the strategy
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    _update_digest(digest, strategy.cache_params())
+
+    return f'{type(strategy).__name__}_{digest.hexdigest()}'
+
+
+def data_key(data: pd.DataFrame) -> str:
+    """ Key of the prices in a fitting window
+
+    Args:
+        data (pd.DataFrame): historical price data of stocks
+
+    Returns:
+        str: key of the data
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    _update_digest(digest, data)
+
+    return digest.hexdigest()
+
+
+class WindowCache:
+    def __init__(self, cache_dir: str):
+        """ Initializes an on-disk cache of walk-forward allocations, one JSON file per window
+            Windows are keyed by the strategy's parameters, the window dates and a hash of
+            the fitting data, so a rerun only fits windows that changed
+
+        Args:
+            cache_dir (str): folder to store the allocations in
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+
+    def _path(self, strategy: Strategy, fit_start: str, fit_end: str, data: pd.DataFrame) -> str:
+        return os.path.join(
+            self.cache_dir, strategy_key(strategy), f'{fit_start}_{fit_end}_{data_key(data)}.json'
+        )
+
+
+    def get(self, strategy: Strategy, fit_start: str, fit_end: str, data: pd.DataFrame) -> dict:
+        """ Gets the cached allocation of a window
+
+        Args:
+            strategy (Strategy): strategy fitted on the window
+            fit_start (str): first date of the fitting window
+            fit_end (str): last date of the fitting window
+            data (pd.DataFrame): prices of the fitting window
+
+        Returns:
+            dict: {ticker: weight}, None if the window is not cached
+        """
+        path = self._path(strategy, fit_start, fit_end, data)
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as f:
+            return json.load(f)['portfolio']
+
+
+    def put(self, strategy: Strategy, fit_start: str, fit_end: str, data: pd.DataFrame, allocation: dict) -> None:
+        """ Caches the allocation of a window
+
+        Args:
+            strategy (Strategy): strategy fitted on the window
+            fit_start (str): first date of the fitting window
+            fit_end (str): last date of the fitting window
+            data (pd.DataFrame): prices of the fitting window
+            allocation (dict): {ticker: weight} generated by the strategy
+        """
+        path = self._path(strategy, fit_start, fit_end, data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        params_path = os.path.join(os.path.dirname(path), 'params.json')
+        if not os.path.exists(params_path):
+            params = {k: repr(v) for k, v in strategy.cache_params().items()}
+            with open(params_path, 'w') as f:
+                json.dump({'strategy': type(strategy).__name__, 'params': params}, f, indent=2)
+
+        entry = {
+            'fit_start': fit_start,
+            'fit_end': fit_end,
+            'created': pd.Timestamp.now().isoformat(),
+            'portfolio': {str(ticker): float(weight) for ticker, weight in allocation.items()},
+        }
+        # write then rename, so an interrupted run never leaves a partial window
+        with open(path + '.tmp', 'w') as f:
+            json.dump(entry, f)
+        os.replace(path + '.tmp', path)
+
+
+    def entries(self, strategy: Strategy=None) -> pd.DataFrame:
+        """ Lists the cached windows
+
+        Args:
+            strategy (Strategy, optional): only list windows of this strategy's parameters. Defaults to None.
+
+        Returns:
+            pd.DataFrame: strategy key, window dates, creation time and path of each window
+        """
+        keys = [strategy_key(strategy)] if strategy is not None else sorted(os.listdir(self.cache_dir))
+
+        rows = []
+        for key in keys:
+            folder = os.path.join(self.cache_dir, key)
+            if not os.path.isdir(folder):
+                continue
+
+            for filename in sorted(os.listdir(folder)):
+                if filename == 'params.json' or not filename.endswith('.json'):
+                    continue
+
+                path = os.path.join(folder, filename)
+                with open(path) as f:
+                    entry = json.load(f)
+                rows.append({
+                    'strategy_key': key,
+                    'fit_start': entry['fit_start'],
+                    'fit_end': entry['fit_end'],
+                    'created': entry['created'],
+                    'path': path,
+                })
+
+        return pd.DataFrame(rows, columns=['strategy_key', 'fit_start', 'fit_end', 'created', 'path'])
+
+
+    def invalidate(self, strategy: Strategy=None, start_date: str=None, end_date: str=None) -> int:
+        """ Removes cached windows, e.g. after the strategy's code changed
+
+        Args:
+            strategy (Strategy, optional): only remove windows of this strategy's parameters. Defaults to None (all).
+            start_date (str, optional): only remove windows ending on or after this date. Defaults to None.
+            end_date (str, optional): only remove windows ending on or before this date. Defaults to None.
+
+        Returns:
+            int: number of windows removed
+        """
+        entries = self.entries(strategy)
+        if start_date is not None:
+            entries = entries[entries['fit_end'] >= pd.Timestamp(start_date).strftime('%Y-%m-%d')]
+        if end_date is not None:
+            entries = entries[entries['fit_end'] <= pd.Timestamp(end_date).strftime('%Y-%m-%d')]
+
+        for path in entries['path']:
+            os.remove(path)
+
+        return len(entries)
+
+
+    def clear(self) -> None:
+        """ Removes every cached window
+        """
+        shutil.rmtree(self.cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
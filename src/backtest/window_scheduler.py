@@ -0,0 +1,108 @@
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from typing import Iterator
+
+class WindowScheduler:
+    def __init__(
+        self,
+        index: pd.DatetimeIndex,
+        trading_freq: str,
+        fitting_window: int,
+        fitting_window_units: str,
+        mode: str='rolling',
+        anchor_date: str=None,
+    ):
+        """ Precomputes the fitting and holding windows of a walk-forward backtest as row
+            offsets into the price data, once for every strategy and parameter set run on it.
+            Rows match data.loc[fit_start:fit_end] and data.loc[purchase_date:prediction_date]
+
+        Args:
+            index (pd.DatetimeIndex): dates of the price data
+            trading_freq (str): how often to trade (D, W, MS, YS)
+            fitting_window (int): window size for fitting the model
+            fitting_window_units (str): units for fitting window (days, months, years)
+            mode (str, optional): 'rolling' fits on the last fitting_window, 'expanding' on all data
+                up to the rebalance date and 'anchored' on all data since anchor_date. Defaults to 'rolling'.
+            anchor_date (str, optional): first date of every fitting window in anchored mode. Defaults to None.
+        """
+        if mode not in ('rolling', 'expanding', 'anchored'):
+            raise ValueError("mode must be 'rolling', 'expanding' or 'anchored'")
+        if mode == 'anchored' and anchor_date is None:
+            raise ValueError('anchored windows need an anchor_date')
+
+        self.index = index
+        self.trading_freq = trading_freq
+        self.fitting_window = fitting_window
+        self.fitting_window_units = fitting_window_units
+        self.mode = mode
+        self.anchor_date = anchor_date
+
+        delta = relativedelta(**{fitting_window_units: fitting_window})
+        test_dates = pd.date_range(index[0] + delta, index[-1], freq=trading_freq)
+
+        # drop last date to avoid out of bounds error
+        rebalance_dates = test_dates[:-1]
+        if mode == 'rolling':
+            fit_start_dates = pd.DatetimeIndex([date - delta for date in rebalance_dates])
+        elif mode == 'expanding':
+            fit_start_dates = pd.DatetimeIndex([index[0]] * len(rebalance_dates))
+        else:
+            fit_start_dates = pd.DatetimeIndex([pd.Timestamp(anchor_date)] * len(rebalance_dates))
+
+        # dates are compared by day, like slicing with 'YYYY-MM-DD' labels
+        days = index.normalize()
+        self.windows = pd.DataFrame({
+            'fit_start': fit_start_dates.strftime('%Y-%m-%d'),
+            'fit_end': rebalance_dates.strftime('%Y-%m-%d'),
+            'prediction_date': test_dates[1:].strftime('%Y-%m-%d'),
+            'fit_start_row': days.searchsorted(fit_start_dates.normalize(), side='left'),
+            'fit_end_row': days.searchsorted(rebalance_dates.normalize(), side='right'),
+            'hold_start_row': days.searchsorted(rebalance_dates.normalize(), side='left'),
+            'hold_end_row': days.searchsorted(test_dates[1:].normalize(), side='right'),
+        })
+
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+
+    def __iter__(self) -> Iterator[pd.Series]:
+        for _, window in self.windows.iterrows():
+            yield window
+
+
+    def fit_slice(self, i: int) -> slice:
+        """ Rows of the i-th fitting window
+
+        Args:
+            i (int): window number
+
+        Returns:
+            slice: rows of the fitting window
+        """
+        return slice(self.windows['fit_start_row'].iat[i], self.windows['fit_end_row'].iat[i])
+
+
+    def hold_slice(self, i: int) -> slice:
+        """ Rows of the i-th holding period, from the purchase date to the prediction date
+
+        Args:
+            i (int): window number
+
+        Returns:
+            slice: rows of the holding period
+        """
+        return slice(self.windows['hold_start_row'].iat[i], self.windows['hold_end_row'].iat[i])
+
+
+    def fit_data(self, data: pd.DataFrame, i: int) -> pd.DataFrame:
+        """ Fitting data of the i-th window, a view of the rows without copying them
+
+        Args:
+            data (pd.DataFrame): price data the schedule was built for
+            i (int): window number
+
+        Returns:
+            pd.DataFrame: prices of the fitting window
+        """
+        return data.iloc[self.fit_slice(i)]
@@ -1,35 +1,214 @@
 import json
+import time
+import threading
 import yfinance as yf
 import pandas as pd
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from scipy.stats import gmean
-import statsmodels.api as sm
 from typing import Tuple
 
+from ..utils.online_stats import RollingCovariance
+
+MARKET_TICKERS = ['^GSPC', '^TNX']
+
+_market_contexts = OrderedDict()
+_market_contexts_lock = threading.Lock()
+_MARKET_CONTEXTS_SIZE = 8
+# yf.download keeps its results in module globals, so only one download runs at a time
+_download_lock = threading.RLock()
+
+def _download_adj_close(tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+    with _download_lock:
+        data = yf.download(tickers, start=start_date, end=end_date, auto_adjust=False)['Adj Close']
+        
+    return data.to_frame(tickers[0]) if isinstance(data, pd.Series) else data
+
+
+class _DownloadBatch:
+    def __init__(self):
+        self.tickers = set()
+        self.started = False
+        self.prices = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _BatchedDownloader:
+    def __init__(self):
+        """ Merges the downloads of agents asking for the same period at the same time.
+            A download waiting for another one to finish collects the tickers requested
+            meanwhile, so many agents share one yf.download call
+        """
+        self._pending = {}
+        self._lock = threading.Lock()
+        
+    
+    def download(self, tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+        """ Downloads adj close prices, in one request with any other tickers of the period waiting to download
+
+        Args:
+            tickers (list): stock tickers
+            start_date (str): start date of the price history
+            end_date (str): end date of the price history
+
+        Returns:
+            pd.DataFrame: adj close prices of tickers
+        """
+        key = (start_date, end_date)
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _DownloadBatch()
+            batch.tickers.update(tickers)
+        
+        if leader:
+            # later agents join the batch until the download lock is free
+            with _download_lock:
+                with self._lock:
+                    del self._pending[key]
+                    symbols = sorted(batch.tickers)
+                try:
+                    batch.prices = _download_adj_close(symbols, start_date, end_date)
+                except Exception as e:
+                    batch.error = e
+                finally:
+                    batch.done.set()
+        else:
+            batch.done.wait()
+        
+        if batch.error is not None:
+            raise batch.error
+        
+        # yfinance returns upper case symbols, columns are named as requested
+        prices = batch.prices.rename(columns=lambda ticker: str(ticker).upper())
+        return prices.reindex(columns=[ticker.upper() for ticker in tickers]).set_axis(tickers, axis=1)
+
+
+_downloader = _BatchedDownloader()
+
+def _latest_treasury_yield() -> float:
+    return yf.Ticker('^TNX').info['previousClose'] / 100
+
+
+class MarketContext:
+    def __init__(self, start_date: str, end_date: str, ttl: float=3600):
+        """ Market-wide inputs shared by every QuantAgent analyzing the same period:
+            S&P 500 (^GSPC) and 10 year treasury (^TNX) prices and the latest treasury yield.
+            They are downloaded on first use, in the same request as the first agent's prices,
+            and reused until ttl seconds pass
+
+        Args:
+            start_date (str): start date of the price history
+            end_date (str): end date of the price history
+            ttl (float, optional): seconds before the inputs are downloaded again. Defaults to 3600.
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.ttl = ttl
+        self.market_prices = None
+        self.treasury_prices = None
+        self.risk_free_rate = None
+        self.fetched_at = None
+        self._lock = threading.Lock()
+        
+    
+    @classmethod
+    def shared(cls, start_date: str, end_date: str) -> 'MarketContext':
+        """ Gets the context of a period, shared by every agent in the process
+
+        Args:
+            start_date (str): start date of the price history
+            end_date (str): end date of the price history
+
+        Returns:
+            MarketContext: shared context of the period
+        """
+        with _market_contexts_lock:
+            key = (start_date, end_date)
+            if key not in _market_contexts:
+                _market_contexts[key] = cls(start_date, end_date)
+            
+            # periods move with the date, least recently used ones are dropped
+            _market_contexts.move_to_end(key)
+            if len(_market_contexts) > _MARKET_CONTEXTS_SIZE:
+                _market_contexts.popitem(last=False)
+                
+            return _market_contexts[key]
+    
+    
+    def load(self, tickers: list=None) -> pd.DataFrame:
+        """ Downloads the prices of tickers, with the market inputs if they are missing or stale.
+            Only a stale refresh holds the context: agents loading meanwhile wait for it, then
+            download their own tickers together in one batched request
+
+        Args:
+            tickers (list, optional): stocks to download prices for. Defaults to None.
+
+        Returns:
+            pd.DataFrame: adj close prices of tickers
+        """
+        tickers = list(tickers or [])
+        with self._lock:
+            if self.fetched_at is None or time.time() - self.fetched_at > self.ttl:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    # the yield lookup does not go through yf.download, so it can overlap with it
+                    risk_free_rate = executor.submit(_latest_treasury_yield)
+                    prices = _downloader.download(tickers + MARKET_TICKERS, self.start_date, self.end_date)
+                    
+                    self.market_prices = prices['^GSPC'].dropna()
+                    self.treasury_prices = prices['^TNX'].dropna()
+                    self.risk_free_rate = risk_free_rate.result()
+                    self.fetched_at = time.time()
+                    
+                return prices.drop(columns=MARKET_TICKERS)
+        
+        if not tickers:
+            return pd.DataFrame()
+        
+        return _downloader.download(tickers, self.start_date, self.end_date)
+
+
 class QuantAgent:
     def __init__(
         self,
         ticker: str,
+        market: MarketContext=None,
     ):
+        """ Initializes an agent analyzing one stock over the past year
+            Its prices and any stale market inputs are downloaded in one request,
+            while the option chain is looked up concurrently
+
+        Args:
+            ticker (str): stock ticker
+            market (MarketContext, optional): market inputs to reuse. Defaults to None (shared context of the period).
+        """
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365)
         
         self.ticker = ticker
         self.end_date = end_date.strftime('%Y-%m-%d')
         self.start_date = start_date.strftime('%Y-%m-%d')
-        self.prices, self.returns = self._get_prices()
+        self.market = market if market is not None else MarketContext.shared(self.start_date, self.end_date)
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            option_chain = executor.submit(self._get_option_chain)
+            self.prices, self.returns = self._get_prices()
+            self.option_chain = option_chain.result()
         
         
     def _get_prices(self) -> Tuple[pd.Series, pd.Series]:
-        # download past year of adj close prices
-        prices = yf.download(self.ticker, start=self.start_date, end=self.end_date)['Adj Close']
+        # download past year of adj close prices, with the market inputs if they are stale
+        prices = self.market.load([self.ticker]).iloc[:, 0].dropna()
         returns = prices.pct_change().dropna()
         
         return prices, returns
     
     
-    def _get_iv(self, strike) -> float:
+    def _get_option_chain(self):
         ticker = yf.Ticker(self.ticker)
         expire_dates = ticker.options
         
@@ -38,9 +217,14 @@ class QuantAgent:
             expire_dates, key=lambda x: abs(datetime.now() + timedelta(days=30) - datetime.strptime(x, '%Y-%m-%d'))
         )
         
+        # calls and puts come from the same request
+        return ticker.option_chain(expire_date)
+    
+    
+    def _get_iv(self, strike) -> float:
         # average call and put iv for the strike price
-        call_iv = ticker.option_chain(expire_date).calls
-        put_iv = ticker.option_chain(expire_date).puts
+        call_iv = self.option_chain.calls
+        put_iv = self.option_chain.puts
         call_strikes = call_iv['strike'].values
         put_strikes = put_iv['strike'].values
         atm_call = min(call_strikes, key=lambda x: abs(x - strike))
@@ -53,34 +237,27 @@ class QuantAgent:
     
     
     def _get_alpha_beta(self) -> Tuple[float, float]:
-        # risk-free rate (daily)
-        rf = yf.download(
-            '^TNX', start=self.start_date, end=self.end_date
-        )['Adj Close'].values / (100*252)
-        rf = np.delete(rf, 0) # match length of returns
-        
-        # market returns
-        rm = yf.download(
-            '^GSPC', start=self.start_date, end=self.end_date
-        )['Adj Close'].pct_change().dropna().values
-        
-        # excess returns
-        rm = rm - rf
-        ri = self.returns - rf
+        # stock and market prices on the same dates, the treasury yield carried over
+        # bond market holidays (e.g. Columbus Day) when stocks still trade
+        prices = pd.concat([self.prices, self.market.market_prices], axis=1, join='inner')
+        treasury = self.market.treasury_prices
+        treasury = treasury.reindex(treasury.index.union(prices.index)).ffill().reindex(prices.index)
         
-        # regression to fit alpha and beta
-        X = sm.add_constant(rm)
-        model = sm.OLS(ri, X)
-        results = model.fit()
+        # daily excess returns of the stock and the market, paired by date
+        rf = treasury / (100*252)
+        excess = prices.pct_change().iloc[1:].sub(rf.iloc[1:], axis=0).dropna()
+        ri = excess.iloc[:, 0].to_numpy()
+        rm = excess.iloc[:, 1].to_numpy()
         
-        alpha = results.params.iloc[0]
-        beta = results.params.iloc[1]
+        # least squares alpha and beta in one pass over the year
+        regression = RollingCovariance()
+        regression.update(np.reshape(ri, (-1, 1)), rm)
         
-        return alpha, beta
+        return regression.alpha()[0], regression.beta()[0]
 
 
     def _get_rf(self) -> float:
-        return yf.Ticker('^TNX').info['previousClose'] / 100
+        return self.market.risk_free_rate
         
     
     def _run_analysis(self) -> dict:
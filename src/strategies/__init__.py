@@ -1,4 +1,6 @@
 from .strategy import *
+from .moving_averages import *
 from .pca_fa import *
 from .ewmac import *
-from .smac import *
\ No newline at end of file
+from .smac import *
+from .pairs_trading import *
\ No newline at end of file
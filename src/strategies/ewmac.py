@@ -11,9 +11,12 @@ Steps:
     2. Buy when short-term EWMAC crosses above long-term EWMAC
     3. Sell when short-term EWMAC crosses below long-term EWMAC
 """
+import numpy as np
 import pandas as pd
+from typing import Union
 
-from .strategy import Strategy
+from .strategy import Strategy, crossover_signals
+from .moving_averages import ewm_state, ewm_update, span_to_alpha
 
 class EWMAC(Strategy):
     def __init__(
@@ -36,28 +39,60 @@ class EWMAC(Strategy):
     def generate_portfolio(self, _):
         raise NotImplementedError('This is a trading strategy. Use generate_signals instead.')
     
-    def generate_signals(self, data: pd.Series) -> pd.Series:
+    def generate_signals(self, data: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
         """Generates trading signals for each stock based on the EWMAC strategy
 
         Args:
-            data (pd.Series): historical price data of stocks
+            data (Union[pd.Series, pd.DataFrame]): historical price data of a stock, or (dates, tickers) panel of stocks
 
         Returns:
-            pd.Series: trading signals
+            Union[pd.Series, pd.DataFrame]: int8 signals for each stock
         """
-        signals = pd.Series(0, index=data.index)
-        
+        # exponential moving averages of every column in one pass
         short_ewmac = data.ewm(span=self.short_window, adjust=False).mean()
         long_ewmac = data.ewm(span=self.long_window, adjust=False).mean()
         
-        # buy when short SMA is greater than long SMA
-        signals[short_ewmac > long_ewmac] = 1
+        # buy when short EWMAC is greater than long EWMAC
+        # short (or exit if shorting is disabled) when short EWMAC is less than long EWMAC
+        return crossover_signals(short_ewmac, long_ewmac, self.enable_shorting)
+    
+    def init_state(self, history: Union[pd.Series, pd.DataFrame]) -> dict:
+        """Builds the state for streaming EWMAC signals from historical prices
+
+        Args:
+            history (Union[pd.Series, pd.DataFrame]): historical price data of a stock, or (dates, tickers) panel of stocks
+
+        Returns:
+            dict: running exponential averages of each stock
+        """
+        values, tickers = self._history_values(history)
         
-        # short if short SMA is less than long SMA and shorting is enabled
-        if self.enable_shorting:
-            signals[short_ewmac < long_ewmac] = -1
-        # else, exit positions when short SMA is less than long SMA
-        else:
-            signals[short_ewmac < long_ewmac] = 0
+        state = {
+            'tickers': tickers,
+            'short': ewm_state((values.shape[1],)),
+            'long': ewm_state((values.shape[1],)),
+        }
+        for row in values:
+            self._update_values(state, row)
+            
+        return state
+    
+    def _update_values(self, state: dict, values: np.ndarray) -> np.ndarray:
+        short_ewmac = ewm_update(state['short'], values, span_to_alpha(self.short_window))
+        long_ewmac = ewm_update(state['long'], values, span_to_alpha(self.long_window))
+        
+        return crossover_signals(short_ewmac, long_ewmac, self.enable_shorting)
+    
+    def update(self, state: dict, bar: Union[float, pd.Series]) -> Union[int, pd.Series]:
+        """Adds a new bar of prices and returns its EWMAC signal in O(1) per stock
+
+        Args:
+            state (dict): streaming state from init_state(), updated in place
+            bar (Union[float, pd.Series]): new price of the stock, or prices indexed by ticker
+
+        Returns:
+            Union[int, pd.Series]: signal for the stock, or signals indexed by ticker
+        """
+        signals = self._update_values(state, self._bar_values(state, bar))
         
-        return signals
+        return self._format_signals(state, signals)
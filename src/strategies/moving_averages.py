@@ -0,0 +1,138 @@
+"""
+Incremental moving average kernels
+
+Each update costs O(1) per column and follows the same floating point steps as
+pandas rolling(window).mean() and ewm(span, adjust=False).mean(), so averages
+built bar by bar are identical to the batch results. States are plain dicts of
+numpy arrays (one entry per column) so they can be copied or pickled
+"""
+import numpy as np
+
+def rolling_mean_state(n_columns: int) -> dict:
+    """ Creates an empty rolling mean accumulator
+
+    Args:
+        n_columns (int): number of series updated together
+
+    Returns:
+        dict: accumulator state
+    """
+    return {
+        'sum_x': np.zeros(n_columns),
+        'compensation_add': np.zeros(n_columns),
+        'compensation_remove': np.zeros(n_columns),
+        'nobs': np.zeros(n_columns, dtype=np.int64),
+        'neg_ct': np.zeros(n_columns, dtype=np.int64),
+        'num_same_value': np.zeros(n_columns, dtype=np.int64),
+        'prev_value': np.full(n_columns, np.nan),
+    }
+
+
+def rolling_mean_update(state: dict, new_value: np.ndarray, old_value: np.ndarray, window: int) -> np.ndarray:
+    """ Adds a value to, and removes the value leaving, a rolling mean accumulator
+
+    Args:
+        state (dict): accumulator state from rolling_mean_state(), updated in place
+        new_value (np.ndarray): value entering the window for each column
+        old_value (np.ndarray): value leaving the window for each column, None if the window is not full yet
+        window (int): window size
+
+    Returns:
+        np.ndarray: rolling mean of each column, NaN until the window has no missing values
+    """
+    # remove the value leaving the window (Kahan summation)
+    if old_value is not None:
+        is_observation = ~np.isnan(old_value)
+        y = np.where(is_observation, -old_value, 0.) - state['compensation_remove']
+        t = state['sum_x'] + y
+        state['compensation_remove'] = np.where(is_observation, t - state['sum_x'] - y, state['compensation_remove'])
+        state['sum_x'] = np.where(is_observation, t, state['sum_x'])
+        state['nobs'] -= is_observation
+        state['neg_ct'] -= is_observation & np.signbit(old_value)
+
+    # add the value entering the window
+    is_observation = ~np.isnan(new_value)
+    y = np.where(is_observation, new_value, 0.) - state['compensation_add']
+    t = state['sum_x'] + y
+    state['compensation_add'] = np.where(is_observation, t - state['sum_x'] - y, state['compensation_add'])
+    state['sum_x'] = np.where(is_observation, t, state['sum_x'])
+    state['nobs'] += is_observation
+    state['neg_ct'] += is_observation & np.signbit(new_value)
+
+    # count repeated values to return them exactly
+    same_value = new_value == state['prev_value']
+    state['num_same_value'] = np.where(
+        is_observation, np.where(same_value, state['num_same_value'] + 1, 1), state['num_same_value']
+    )
+    state['prev_value'] = np.where(is_observation, new_value, state['prev_value'])
+
+    nobs = state['nobs']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = state['sum_x'] / nobs
+    # all positive (negative) values can't have a negative (positive) mean
+    mean = np.where((state['neg_ct'] == nobs) & (mean > 0), 0., mean)
+    mean = np.where((state['neg_ct'] == 0) & (mean < 0), 0., mean)
+    mean = np.where(state['num_same_value'] >= nobs, state['prev_value'], mean)
+
+    return np.where((nobs >= window) & (nobs > 0), mean, np.nan)
+
+
+def ewm_state(shape: tuple) -> dict:
+    """ Creates an empty exponential moving average accumulator
+
+    Args:
+        shape (tuple): shape of the averages updated together, e.g. (n_columns,) or (n_spans, n_columns)
+
+    Returns:
+        dict: accumulator state
+    """
+    return {
+        'weighted': np.full(shape, np.nan),
+        'old_wt': np.ones(shape),
+    }
+
+
+def span_to_alpha(span):
+    """ Converts an ewm span to its smoothing factor, as pandas does
+
+    Args:
+        span (Union[int, np.ndarray]): span(s) of the average
+
+    Returns:
+        Union[float, np.ndarray]: smoothing factor(s)
+    """
+    com = (np.asarray(span, dtype=float) - 1) / 2.0
+    return 1. / (1. + com)
+
+
+def ewm_update(state: dict, value: np.ndarray, alpha) -> np.ndarray:
+    """ Adds a value to an exponential moving average accumulator (adjust=False)
+
+    Args:
+        state (dict): accumulator state from ewm_state(), updated in place
+        value (np.ndarray): new value for each column, broadcast against the state
+        alpha (Union[float, np.ndarray]): smoothing factor(s), broadcast against the state
+
+    Returns:
+        np.ndarray: exponential moving average, NaN until the first observation
+    """
+    weighted = state['weighted']
+    value = np.broadcast_to(value, weighted.shape)
+    is_observation = ~np.isnan(value)
+    started = ~np.isnan(weighted)
+
+    # missing values still decay the weight of the average
+    old_wt = np.where(started, state['old_wt'] * (1. - alpha), state['old_wt'])
+    update = started & is_observation & (weighted != value)
+    with np.errstate(invalid='ignore'):
+        blended = (old_wt*weighted + alpha*value) / (old_wt + alpha)
+    weighted = np.where(update, blended, weighted)
+    old_wt = np.where(started & is_observation, 1., old_wt)
+
+    # first observation starts the average
+    weighted = np.where(~started & is_observation, value, weighted)
+
+    state['weighted'] = weighted
+    state['old_wt'] = old_wt
+
+    return weighted
@@ -2,12 +2,166 @@
 Trading strategy based on pairs trading.
 
 Objective:
-    Utilize statistical arbitrage to capture the long term 
+    Utilize statistical arbitrage to capture the long term
     mean-reverting behavior of two cointegrated stocks.
-    
+
 Data Used: daily historical prices of two cointegrated stocks
 Training data length: 3 years (~750 trading days)
 Trading Frequency: daily
 
 Steps:
-"""
\ No newline at end of file
+    1. Pre-filter pairs of stocks by the correlation of their prices in the training window
+    2. Fit the hedge ratio of each pair and test the spread for a unit root (Engle-Granger)
+    3. Keep the most significant cointegrated pairs, each stock in at most one pair
+    4. Short the spread when its z-score rises above the entry threshold,
+       long the spread when it falls below minus the entry threshold
+    5. Exit when the z-score reverts within the exit threshold
+"""
+import numpy as np
+import pandas as pd
+
+from .strategy import Strategy
+from ..utils.cointegration import scan_pairs
+
+class PairsTrading(Strategy):
+    def __init__(
+        self,
+        training_window: int=750,
+        entry_z: float=2.0,
+        exit_z: float=0.5,
+        min_correlation: float=0.8,
+        max_pvalue: float=0.05,
+        adf_lags: int=1,
+        max_pairs: int=None,
+        n_jobs: int=1,
+        cache_dir: str=None,
+    ):
+        """Initializes the PairsTrading strategy
+
+        Args:
+            training_window (int, optional): rows used to find pairs and fit hedge ratios. Defaults to 750.
+            entry_z (float, optional): z-score of the spread to open a position. Defaults to 2.0.
+            exit_z (float, optional): z-score of the spread to close a position. Defaults to 0.5.
+            min_correlation (float, optional): minimum correlation of prices to test a pair. Defaults to 0.8.
+            max_pvalue (float, optional): maximum p-value of cointegrated pairs. Defaults to 0.05.
+            adf_lags (int, optional): lagged differences in the ADF regression. Defaults to 1.
+            max_pairs (int, optional): maximum number of pairs to trade. Defaults to None (no limit).
+            n_jobs (int, optional): processes used to scan pairs. Defaults to 1.
+            cache_dir (str, optional): folder to cache pair scans in. Defaults to None.
+        """
+        self.training_window = training_window
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.min_correlation = min_correlation
+        self.max_pvalue = max_pvalue
+        self.adf_lags = adf_lags
+        self.max_pairs = max_pairs
+        self.n_jobs = n_jobs
+        self.cache_dir = cache_dir
+
+    @property
+    def independent_columns(self) -> bool:
+        # signals of each leg depend on the other leg of its pair
+        return False
+
+    def cache_params(self) -> dict:
+        # processes and the scan cache folder don't change the pairs found
+        params = super().cache_params()
+        del params['n_jobs'], params['cache_dir']
+
+        return params
+
+    def generate_portfolio(self, _):
+        raise NotImplementedError('This is a trading strategy. Use generate_signals() instead.')
+
+    def find_pairs(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Finds cointegrated pairs in the training window, each stock in at most one pair
+
+        Args:
+            data (pd.DataFrame): historical price data (dates, tickers)
+
+        Returns:
+            pd.DataFrame: selected pairs with hedge ratios and test statistics, most significant first
+        """
+        pairs = scan_pairs(
+            data.iloc[:self.training_window],
+            min_correlation=self.min_correlation,
+            max_pvalue=self.max_pvalue,
+            adf_lags=self.adf_lags,
+            n_jobs=self.n_jobs,
+            cache_dir=self.cache_dir,
+        )
+
+        # greedily keep the most significant pairs without reusing stocks
+        used = set()
+        selected = []
+        for i, (y, x) in enumerate(zip(pairs['y'], pairs['x'])):
+            if y in used or x in used:
+                continue
+            used.update((y, x))
+            selected.append(i)
+
+            if self.max_pairs is not None and len(selected) >= self.max_pairs:
+                break
+
+        return pairs.iloc[selected].reset_index(drop=True)
+
+    def pair_legs(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Pairs traded by generate_signals, for the trader to size x by the hedge ratio of y
+
+        Args:
+            data (pd.DataFrame): historical price data (dates, tickers)
+
+        Returns:
+            pd.DataFrame: y, x (columns of data) and hedge_ratio of each pair
+        """
+        pairs = self.find_pairs(data)
+        tickers = {str(col): col for col in data.columns}
+
+        return pd.DataFrame({
+            'y': [tickers[y] for y in pairs['y']],
+            'x': [tickers[x] for x in pairs['x']],
+            'hedge_ratio': pairs['hedge_ratio'].to_numpy(dtype=float),
+        })
+
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Generates trading signals for each stock based on the z-score of its pair's spread
+            Long spread: long y (1), short x (-1). Short spread: short y (-1), long x (1).
+            Signals are 0 during the training window and for stocks not in a pair.
+            BacktestTrader sizes the legs of each pair with pair_legs()
+
+        Args:
+            data (pd.DataFrame): historical price data (dates, tickers), e.g. the two stocks of a pair
+
+        Returns:
+            pd.DataFrame: int8 signals for each stock
+        """
+        signals = pd.DataFrame(0, index=data.index, columns=data.columns, dtype=np.int8)
+        pairs = self.find_pairs(data)
+        if pairs.empty:
+            return signals
+
+        tickers = {str(col): col for col in data.columns}
+        y_cols = [tickers[y] for y in pairs['y']]
+        x_cols = [tickers[x] for x in pairs['x']]
+
+        # z-scores of every spread after the training window
+        trading = data.iloc[self.training_window:]
+        spread = (
+            trading[y_cols].to_numpy(dtype=float)
+            - pairs['intercept'].to_numpy()
+            - pairs['hedge_ratio'].to_numpy()*trading[x_cols].to_numpy(dtype=float)
+        )
+        z_score = spread / pairs['spread_std'].to_numpy()
+
+        # open beyond the entry threshold, close inside the exit threshold, otherwise keep the position
+        positions = np.full(z_score.shape, np.nan)
+        positions[np.abs(z_score) < self.exit_z] = 0
+        positions[z_score > self.entry_z] = -1
+        positions[z_score < -self.entry_z] = 1
+        positions = pd.DataFrame(positions).ffill().fillna(0).to_numpy(dtype=np.int8)
+
+        signals.loc[trading.index, y_cols] = positions
+        signals.loc[trading.index, x_cols] = -positions
+
+        return signals
@@ -20,9 +20,11 @@ import pandas as pd
 import numpy as np
 
 from .strategy import Strategy
-from ..utils.stats import pca, fit_regression, forecast_arima, cluster_kmeans
+from ..utils.stats import pca, fit_regression_batch, cluster_kmeans
+from ..utils.forecasting import ArimaForecaster
 from ..utils.optimize_portfolio import optimize_portfolio
 from ..utils.tools import daily_to_monthly
+from ..utils.price_panel import PricePanel
 
 class PCA_FA(Strategy):
     def __init__(
@@ -31,7 +33,11 @@ class PCA_FA(Strategy):
         tickers_per_cluster: int=1,
         pc_variance_threshold: float=0.9,
         expected_return_threshold: float=0,
-        alpha_threshold: float=0
+        alpha_threshold: float=0,
+        arima_reselect_every: int=1,
+        cluster_kwargs: dict=None,
+        panel: PricePanel=None,
+        warm_start: bool=False,
     ):
         """Initializes the PCA_FA strategy
 
@@ -41,12 +47,39 @@ class PCA_FA(Strategy):
             pc_variance_threshold (float, optional): variance of data to capture with PCA. Defaults to 0.9.
             expected_return_threshold (float, optional): minimum expected return of stocks to select. Defaults to 0.
             alpha_threshold (float, optional): minimum alpha of stocks to select. Defaults to 0.
+            arima_reselect_every (int, optional): rebalances between ARIMA order searches for the factors. 
+                Fits in between reuse the order and warm-start from the last parameters. Defaults to 1.
+            cluster_kwargs (dict, optional): options for cluster_kmeans, e.g. 
+                {'silhouette': 'sampled', 'patience': 5, 'n_jobs': -1} for large universes. Defaults to None.
+            panel (PricePanel, optional): memory-mapped panel of the backtested prices. Daily returns are read
+                from its precomputed returns instead of recomputed for every window. Defaults to None.
+            warm_start (bool, optional): start the weight optimization from the last window's weights.
+                Makes the strategy stateful, so windows are fitted in date order. Defaults to False.
         """
         self.factors = factors
         self.tickers_per_cluster = tickers_per_cluster
         self.pc_variance_threshold = pc_variance_threshold
         self.expected_return_threshold = expected_return_threshold
         self.alpha_threshold = alpha_threshold
+        self.arima_reselect_every = arima_reselect_every
+        self.cluster_kwargs = cluster_kwargs or {}
+        self.panel = panel
+        self.warm_start = warm_start
+        self._forecaster = ArimaForecaster(reselect_every=arima_reselect_every)
+        self._last_weights = {}
+    
+    @property
+    def stateful(self) -> bool:
+        # cached ARIMA orders (and last weights with warm_start) carry over to the next windows
+        return self.arima_reselect_every > 1 or self.warm_start
+    
+    def cache_params(self) -> dict:
+        # the panel only holds the prices, n_jobs only the number of processes
+        params = super().cache_params()
+        del params['panel']
+        params['cluster_kwargs'] = {k: v for k, v in self.cluster_kwargs.items() if k != 'n_jobs'}
+        
+        return params
     
     def generate_portfolio(self, data: pd.DataFrame) -> dict:
         """ Generates a portfolio of tickers and weights based on the PCA_FA strategy
@@ -58,7 +91,10 @@ class PCA_FA(Strategy):
             dict: weights of selected stocks in portfolio
         """
         # convert daily prices to daily returns
-        data = data.pct_change(fill_method=None)[1:]
+        if self.panel is not None:
+            data = self.panel.to_frame(data.index[1], data.index[-1], list(data.columns), returns=True)
+        else:
+            data = data.pct_change(fill_method=None)[1:]
         
         start_date = data.index[0]
         end_date = data.index[-1]
@@ -67,55 +103,37 @@ class PCA_FA(Strategy):
         factors = self.factors.loc[start_date:end_date]
         
         # forecast factors using ARIMA
-        factor_forecasts = {}
         monthly_factors = daily_to_monthly(factors)
-        for col in monthly_factors.columns:
-            factor_forecasts[col] = forecast_arima(monthly_factors[col])['forecast']
+        factor_forecasts = self._forecaster.forecast_many(monthly_factors)
             
-        expected_returns = [] # calculated using forecasted factors
-        betas = [] # used for calculating covariance matrix
-        alphas = [] # intercepts of regression
-        mse = [] # mean squared error of regression
         x = monthly_factors[['Mkt-RF', 'SMB', 'HML', 'Mom']] # Carhart factors
         
-        # fit regression and calculate expected returns for each stock
-        cols_to_drop = []
-        for col in data.columns:
-            stock_returns = data[col].dropna()
-            
-            if len(stock_returns) != len(factors):
-                cols_to_drop.append(col)
-                continue
-            else:
-                y = data[col] - factors['RF'] # excess returns
-            
-                # convert to monthly returns
-                y = daily_to_monthly(y)
-                # fit regression model
-                res = fit_regression(x, y)
-                
-                # Carhart four-factor model
-                expected_returns.append(
-                    res['params']['const'] + \
-                    res['params']['Mkt-RF'] * factor_forecasts['Mkt-RF'] + \
-                    res['params']['SMB'] * factor_forecasts['SMB'] + \
-                    res['params']['HML'] * factor_forecasts['HML'] + \
-                    res['params']['Mom'] * factor_forecasts['Mom'] + \
-                    factor_forecasts['RF']
-                )
-                betas.append(res['params'].values[1:].tolist())
-                mse.append(res['mse'])
-                alphas.append(res['params']['const'])
-        
-        # drop columns with missing data
+        # drop stocks with missing data
+        cols_to_drop = data.columns[data.count() != len(factors)].tolist()
         filtered_returns = data.drop(cols_to_drop, axis=1)
         
+        # monthly excess returns of all stocks, converted in one pass
+        monthly_excess = daily_to_monthly(filtered_returns.sub(factors['RF'], axis=0))
+        
+        # fit regressions for all stocks at once
+        res = fit_regression_batch(x, monthly_excess)
+        params = res['params']
+        
+        # Carhart four-factor model
+        expected_returns = params.loc['const'] + \
+            params.loc['Mkt-RF'] * factor_forecasts['Mkt-RF'] + \
+            params.loc['SMB'] * factor_forecasts['SMB'] + \
+            params.loc['HML'] * factor_forecasts['HML'] + \
+            params.loc['Mom'] * factor_forecasts['Mom'] + \
+            factor_forecasts['RF']
+        
         # convert expected returns to dataframe
-        df = pd.DataFrame(
-            [expected_returns, betas, mse, alphas],
-            index=['expected return', 'beta', 'mse', 'alpha'],
-            columns=filtered_returns.columns
-        ).T
+        df = pd.DataFrame({
+            'expected return': expected_returns, # calculated using forecasted factors
+            'beta': params.iloc[1:].T.values.tolist(), # used for calculating covariance matrix
+            'mse': res['mse'], # mean squared error of regression
+            'alpha': params.loc['const'], # intercepts of regression
+        }, index=filtered_returns.columns)
         num_stocks = len(df)
 
         # pca on returns
@@ -125,7 +143,7 @@ class PCA_FA(Strategy):
         reduced_loadings = pca_res['loadings'].iloc[:num_pcs, :]
         
         # kmeans clustering
-        kmeans = cluster_kmeans(reduced_loadings.T, num_stocks-1)
+        kmeans = cluster_kmeans(reduced_loadings.T, num_stocks-1, **self.cluster_kwargs)
         labels = kmeans['optimal_labels']
         num_clusters = len(set(labels))
         df['label'] = labels
@@ -160,13 +178,22 @@ class PCA_FA(Strategy):
         
         cov_matrix = beta_matrix @ sigma_f @ beta_matrix.T + sigma_e
         
+        # start from last window's weights of the selected stocks, if any are still selected
+        initial_weights = None
+        if self.warm_start:
+            last_weights = np.array([self._last_weights.get(stock, 0.0) for stock in selected_stocks])
+            if last_weights.sum() > 0:
+                initial_weights = last_weights / last_weights.sum()
+        
         # optimize portfolio weights
         weights, _ = optimize_portfolio(
             asset_returns,
             cov_matrix,
             factor_forecasts['RF'],
-            [(0, 1) * len(asset_returns)] # no shorting
+            [(0, 1)] * len(asset_returns), # no shorting
+            initial_weights,
         )
+        self._last_weights = dict(zip(selected_stocks, weights))
         
         allocation = dict(zip(selected_stocks, weights.round(2)))
         # delete stocks with zero allocation
@@ -11,9 +11,12 @@ Steps:
     2. Buy when short-term SMA crosses above long-term SMA
     3. Sell when short-term SMA crosses below long-term SMA
 """
+import numpy as np
 import pandas as pd
+from typing import Union
 
-from .strategy import Strategy
+from .strategy import Strategy, crossover_signals
+from .moving_averages import rolling_mean_state, rolling_mean_update
 
 class SMAC(Strategy):
     def __init__(
@@ -36,28 +39,74 @@ class SMAC(Strategy):
     def generate_portfolio(self, _):
         raise NotImplementedError('This is a trading strategy. Use generate_signals() instead.')
     
-    def generate_signals(self, data: pd.Series) -> pd.Series:
+    def generate_signals(self, data: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
         """Generates trading signals for each stock based on the SMAC strategy
 
         Args:
-            data (pd.Series): historical price data of stocks
+            data (Union[pd.Series, pd.DataFrame]): historical price data of a stock, or (dates, tickers) panel of stocks
 
         Returns:
-            pd.Series: signals for each stock
+            Union[pd.Series, pd.DataFrame]: int8 signals for each stock
         """
-        signals = pd.Series(0, index=data.index)
-        
+        # rolling means of every column in one pass
         short_sma = data.rolling(window=self.short_window).mean()
         long_sma = data.rolling(window=self.long_window).mean()
         
         # buy when short SMA is greater than long SMA
-        signals[short_sma > long_sma] = 1
+        # short (or exit if shorting is disabled) when short SMA is less than long SMA
+        return crossover_signals(short_sma, long_sma, self.enable_shorting)
+    
+    def init_state(self, history: Union[pd.Series, pd.DataFrame]) -> dict:
+        """Builds the state for streaming SMAC signals from historical prices
+
+        Args:
+            history (Union[pd.Series, pd.DataFrame]): historical price data of a stock, or (dates, tickers) panel of stocks
+
+        Returns:
+            dict: running window sums and the last prices of each stock
+        """
+        values, tickers = self._history_values(history)
+        buffer_size = max(self.short_window, self.long_window)
+        
+        state = {
+            'tickers': tickers,
+            'n_bars': 0,
+            'buffer': np.full((buffer_size, values.shape[1]), np.nan), # last prices, ring buffer
+            'short': rolling_mean_state(values.shape[1]),
+            'long': rolling_mean_state(values.shape[1]),
+        }
+        for row in values:
+            self._update_values(state, row)
+            
+        return state
+    
+    def _update_values(self, state: dict, values: np.ndarray) -> np.ndarray:
+        n_bars = state['n_bars']
+        buffer = state['buffer']
+        buffer_size = len(buffer)
         
-        # short if short SMA is less than long SMA and shorting is enabled
-        if self.enable_shorting:
-            signals[short_sma < long_sma] = -1
-        # else, exit positions when short SMA is less than long SMA
-        else:
-            signals[short_sma < long_sma] = 0
+        # prices leaving each window
+        old_short = buffer[(n_bars - self.short_window) % buffer_size].copy() if n_bars >= self.short_window else None
+        old_long = buffer[(n_bars - self.long_window) % buffer_size].copy() if n_bars >= self.long_window else None
+        
+        buffer[n_bars % buffer_size] = values
+        state['n_bars'] = n_bars + 1
+        
+        short_sma = rolling_mean_update(state['short'], values, old_short, self.short_window)
+        long_sma = rolling_mean_update(state['long'], values, old_long, self.long_window)
+        
+        return crossover_signals(short_sma, long_sma, self.enable_shorting)
     
-        return signals
\ No newline at end of file
+    def update(self, state: dict, bar: Union[float, pd.Series]) -> Union[int, pd.Series]:
+        """Adds a new bar of prices and returns its SMAC signal in O(1) per stock
+
+        Args:
+            state (dict): streaming state from init_state(), updated in place
+            bar (Union[float, pd.Series]): new price of the stock, or prices indexed by ticker
+
+        Returns:
+            Union[int, pd.Series]: signal for the stock, or signals indexed by ticker
+        """
+        signals = self._update_values(state, self._bar_values(state, bar))
+        
+        return self._format_signals(state, signals)
@@ -1,7 +1,80 @@
+import copy
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
+from typing import Union
+
+def crossover_signals(
+    short_ma: Union[pd.Series, pd.DataFrame],
+    long_ma: Union[pd.Series, pd.DataFrame],
+    enable_shorting: bool=False
+) -> Union[pd.Series, pd.DataFrame]:
+    """ Converts short and long moving averages to crossover signals
+        1 when short > long, -1 (or 0 without shorting) when short < long, else 0
+
+    Args:
+        short_ma (Union[pd.Series, pd.DataFrame, np.ndarray]): short-term moving average of a stock or a panel of stocks
+        long_ma (Union[pd.Series, pd.DataFrame, np.ndarray]): long-term moving average, same shape as short_ma
+        enable_shorting (bool, optional): signal -1 instead of 0 below the long average. Defaults to False.
+
+    Returns:
+        Union[pd.Series, pd.DataFrame, np.ndarray]: int8 signals, same shape and type as the inputs
+    """
+    short_values = np.asarray(short_ma)
+    long_values = np.asarray(long_ma)
+    
+    signals = np.zeros(short_values.shape, dtype=np.int8)
+    signals[short_values > long_values] = 1
+    if enable_shorting:
+        signals[short_values < long_values] = -1
+        
+    if isinstance(short_ma, pd.DataFrame):
+        return pd.DataFrame(signals, index=short_ma.index, columns=short_ma.columns)
+    elif isinstance(short_ma, pd.Series):
+        return pd.Series(signals, index=short_ma.index)
+    
+    return signals
+
 
 class Strategy(ABC):
+    @property
+    def stateful(self) -> bool:
+        """ Whether results depend on previous calls, e.g. cached fits reused across windows.
+            Stateful strategies must be fitted in date order, not in parallel
+        """
+        return False
+    
+    @property
+    def independent_columns(self) -> bool:
+        """ Whether the signals of each column of a panel only depend on that column.
+            Strategies that trade columns against each other (e.g. pairs) can not be
+            run on a panel of unrelated series, such as stacked bootstrap samples
+        """
+        return True
+    
+    def pair_legs(self, data: pd.DataFrame) -> pd.DataFrame:
+        """ Columns of a panel that trade together as hedged pairs, the second leg holding
+            -hedge_ratio shares for every share of the first. None for strategies that size
+            each column on its own
+
+        Args:
+            data (pd.DataFrame): historical data of stocks (dates, tickers), as given to generate_signals
+
+        Returns:
+            pd.DataFrame: y (first leg), x (second leg) and hedge_ratio of each pair, or None
+        """
+        return None
+    
+    def cache_params(self) -> dict:
+        """ Model parameters that identify the strategy's results, e.g. to key cached windows.
+            Defaults to the public attributes. Strategies holding data or runtime settings
+            (processes, cache folders) leave them out, since they don't change the results
+
+        Returns:
+            dict: {name: value} of the parameters
+        """
+        return {k: v for k, v in vars(self).items() if not k.startswith('_')}
+    
     @abstractmethod
     def generate_portfolio(self, data: pd.DataFrame) -> dict:
         """ Generates a portfolio with tickers and weights based on the strategy
@@ -15,14 +88,85 @@ class Strategy(ABC):
         raise NotImplementedError
     
     @abstractmethod
-    def generate_signals(self, data: pd.Series) -> pd.Series:
-        """ Generates trading signals for a stock based on the strategy
+    def generate_signals(self, data: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+        """ Generates trading signals for a stock, or a panel of stocks, based on the strategy
             1: long, -1: short, 0: exit, 2: hold
 
         Args:
-            data (pd.Series): historical data of stock for generating signals
+            data (Union[pd.Series, pd.DataFrame]): historical data of a stock, or (dates, tickers) 
+                panel of stocks, for generating signals
+
+        Returns:
+            Union[pd.Series, pd.DataFrame]: signals for the stock, or (dates, tickers) signal matrix
+        """
+        raise NotImplementedError
+    
+    def init_state(self, history: Union[pd.Series, pd.DataFrame]) -> dict:
+        """ Builds the state for streaming signals from historical data
+            Use update() to get the signal of each new bar
+
+        Args:
+            history (Union[pd.Series, pd.DataFrame]): historical data of a stock, or (dates, tickers) panel of stocks
+
+        Returns:
+            dict: streaming state of the strategy
+        """
+        raise NotImplementedError('This strategy does not support streaming signals')
+    
+    def update(self, state: dict, bar: Union[float, pd.Series]) -> Union[int, pd.Series]:
+        """ Adds a new bar to the streaming state and returns its signal
+            Signals are identical to generate_signals() on the full history
+
+        Args:
+            state (dict): streaming state from init_state(), updated in place
+            bar (Union[float, pd.Series]): new price of the stock, or prices indexed by ticker
+
+        Returns:
+            Union[int, pd.Series]: signal for the stock, or signals indexed by ticker
+        """
+        raise NotImplementedError('This strategy does not support streaming signals')
+    
+    @staticmethod
+    def snapshot_state(state: dict) -> dict:
+        """ Copies a streaming state, e.g. to save it or roll back to it later
+
+        Args:
+            state (dict): streaming state from init_state()
+
+        Returns:
+            dict: independent copy of the state
+        """
+        return copy.deepcopy(state)
+    
+    @staticmethod
+    def restore_state(snapshot: dict) -> dict:
+        """ Restores a streaming state from a snapshot, leaving the snapshot untouched
+
+        Args:
+            snapshot (dict): state from snapshot_state()
 
         Returns:
-            pd.Series: signals for the stock
+            dict: streaming state to pass to update()
         """
-        raise NotImplementedError
\ No newline at end of file
+        return copy.deepcopy(snapshot)
+    
+    def _history_values(self, history: Union[pd.Series, pd.DataFrame]) -> tuple:
+        # (dates, tickers) values and tickers (None for a single stock)
+        if isinstance(history, pd.DataFrame):
+            return history.to_numpy(dtype=float), list(history.columns)
+        
+        return history.to_numpy(dtype=float)[:, None], None
+    
+    def _bar_values(self, state: dict, bar: Union[float, pd.Series]) -> np.ndarray:
+        if state['tickers'] is None:
+            return np.array([bar], dtype=float)
+        elif isinstance(bar, pd.Series):
+            return bar.reindex(state['tickers']).to_numpy(dtype=float)
+        
+        return np.asarray(bar, dtype=float)
+    
+    def _format_signals(self, state: dict, signals: np.ndarray) -> Union[int, pd.Series]:
+        if state['tickers'] is None:
+            return signals[0]
+        
+        return pd.Series(signals, index=state['tickers'])
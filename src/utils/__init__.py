@@ -1,7 +1,14 @@
 from .parse_tickers import *
 from .optimize_portfolio import *
+from .efficient_frontier import *
 from .stats import *
+from .metrics import *
+from .cointegration import *
+from .forecasting import *
 from .fundamentals import *
 from .tools import *
+from .online_stats import *
+from .price_cache import *
+from .price_panel import *
 from .data_loader import *
 from .plotting import *
\ No newline at end of file
@@ -0,0 +1,240 @@
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import norm
+# MacKinnon (1994) response surface tables used by statsmodels' mackinnonp
+from statsmodels.tsa.adfvalues import _tau_largeps, _tau_maxs, _tau_mins, _tau_smallps, _tau_stars
+from typing import Tuple
+
+_pair_scan_cache = OrderedDict()
+_pair_scan_cache_lock = threading.Lock()
+_PAIR_SCAN_CACHE_SIZE = 64
+# bumped when the scan changes, so scans cached on disk by older versions are not reused
+_SCAN_VERSION = 2
+_worker_prices = None
+
+def _scan_key(prices: pd.DataFrame, params: tuple) -> str:
+    # same window, tickers and settings give the same scan, for any kind of index
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(prices.columns.tolist()).encode())
+    digest.update(pd.util.hash_pandas_object(prices, index=True).to_numpy().tobytes())
+    digest.update(repr(params).encode())
+
+    return digest.hexdigest()
+
+
+def _cached_scan(key: str) -> pd.DataFrame:
+    with _pair_scan_cache_lock:
+        if key not in _pair_scan_cache:
+            return None
+        _pair_scan_cache.move_to_end(key)
+        return _pair_scan_cache[key].copy()
+
+
+def _cache_scan(key: str, pairs: pd.DataFrame) -> None:
+    # least recently used scans are dropped first
+    with _pair_scan_cache_lock:
+        _pair_scan_cache[key] = pairs
+        _pair_scan_cache.move_to_end(key)
+        if len(_pair_scan_cache) > _PAIR_SCAN_CACHE_SIZE:
+            _pair_scan_cache.popitem(last=False)
+
+
+def mackinnon_pvalues(adf_stat: np.ndarray, n_series: int=2) -> np.ndarray:
+    """ MacKinnon's approximate p-values of many ADF statistics at once (regression with a constant)
+        Same as statsmodels' mackinnonp(stat, regression='c', N=n_series) for each statistic
+
+    Args:
+        adf_stat (np.ndarray): test statistics
+        n_series (int, optional): number of series believed to be I(1), 2 for a pair. Defaults to 2.
+
+    Returns:
+        np.ndarray: p-value of each statistic
+    """
+    adf_stat = np.asarray(adf_stat, dtype=float)
+    small_p = np.polyval(_tau_smallps['c'][n_series-1][::-1], adf_stat)
+    large_p = np.polyval(_tau_largeps['c'][n_series-1][::-1], adf_stat)
+    p_values = norm.cdf(np.where(adf_stat <= _tau_stars['c'][n_series-1], small_p, large_p))
+
+    p_values = np.where(adf_stat > _tau_maxs['c'][n_series-1], 1.0, p_values)
+    return np.where(adf_stat < _tau_mins['c'][n_series-1], 0.0, p_values)
+
+
+def candidate_pairs(prices: np.ndarray, min_correlation: float) -> Tuple[np.ndarray, ...]:
+    """ Pre-filters pairs of stocks by the correlation of their prices, along with
+        the covariance matrix the hedge ratios are computed from
+
+    Args:
+        prices (np.ndarray): prices without missing values (dates, tickers)
+        min_correlation (float): minimum correlation of a candidate pair
+
+    Returns:
+        Tuple[np.ndarray, ...]: first and second ticker index, correlation and covariance matrix
+    """
+    cov_matrix = np.cov(prices, rowvar=False)
+    std = np.sqrt(np.diag(cov_matrix))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr_matrix = cov_matrix / np.outer(std, std)
+
+    first, second = np.triu_indices(len(std), k=1)
+    correlation = corr_matrix[first, second]
+    keep = correlation >= min_correlation
+
+    return first[keep], second[keep], correlation[keep], cov_matrix
+
+
+def batch_adf(residuals: np.ndarray, lags: int=1) -> Tuple[np.ndarray, np.ndarray]:
+    """ Augmented Dickey-Fuller test without constant on many residual series at once
+        Same regression as adfuller(x, maxlag=lags, autolag=None, regression='n')
+
+    Args:
+        residuals (np.ndarray): residual series (dates, series)
+        lags (int, optional): lagged differences in the test regression. Defaults to 1.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: test statistic and coefficient on the lagged level of each series
+    """
+    diffs = np.diff(residuals, axis=0)
+    nobs = len(diffs) - lags
+
+    # regressors (series, nobs, 1+lags): lagged level, then lagged differences
+    regressors = [residuals[lags:-1]]
+    regressors += [diffs[lags-k:len(diffs)-k] for k in range(1, lags+1)]
+    x = np.stack(regressors, axis=-1).transpose(1, 0, 2)
+    y = diffs[lags:].T
+
+    xtx_inv = np.linalg.inv(np.einsum('kni,knj->kij', x, x))
+    params = np.einsum('kij,kj->ki', xtx_inv, np.einsum('kni,kn->ki', x, y))
+    resid = y - np.einsum('kni,ki->kn', x, params)
+    mse = np.sum(resid**2, axis=1) / (nobs - lags - 1)
+
+    gamma = params[:, 0]
+    return gamma / np.sqrt(mse * xtx_inv[:, 0, 0]), gamma
+
+
+def _scan_chunk(
+    prices: np.ndarray,
+    y_idx: np.ndarray,
+    x_idx: np.ndarray,
+    intercept: np.ndarray,
+    hedge_ratio: np.ndarray,
+    lags: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    residuals = prices[:, y_idx] - intercept - hedge_ratio*prices[:, x_idx]
+    adf_stat, gamma = batch_adf(residuals, lags)
+
+    return adf_stat, gamma, np.std(residuals, axis=0)
+
+
+def _init_scan_worker(prices: np.ndarray) -> None:
+    # prices are sent once per worker instead of once per chunk
+    global _worker_prices
+    _worker_prices = prices
+
+
+def _scan_chunk_worker(args: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return _scan_chunk(_worker_prices, *args)
+
+
+def scan_pairs(
+    prices: pd.DataFrame,
+    min_correlation: float=0.8,
+    max_pvalue: float=0.05,
+    adf_lags: int=1,
+    chunk_size: int=2000,
+    n_jobs: int=1,
+    cache_dir: str=None,
+) -> pd.DataFrame:
+    """ Scans a universe of stocks for cointegrated pairs (Engle-Granger test)
+        Pairs are pre-filtered by price correlation, then hedge ratios and ADF tests on the
+        spreads run as batched matrix operations over chunks of pairs. Each pair is tested once,
+        regressing the stock with the larger price variance on the other, so the p-values are
+        not inflated by picking the better of two orderings.
+        The last scans are cached in memory, and all of them on disk if cache_dir is given
+
+    Args:
+        prices (pd.DataFrame): prices of the training window (dates, tickers).
+            Tickers with missing prices are skipped
+        min_correlation (float, optional): minimum correlation of prices to test a pair. Defaults to 0.8.
+        max_pvalue (float, optional): maximum p-value of cointegrated pairs. Defaults to 0.05.
+        adf_lags (int, optional): lagged differences in the ADF regression. Defaults to 1.
+        chunk_size (int, optional): pairs tested per batch. Defaults to 2000.
+        n_jobs (int, optional): processes to test chunks in. Defaults to 1 (no pool).
+        cache_dir (str, optional): folder to cache the results in. Defaults to None.
+
+    Returns:
+        pd.DataFrame: cointegrated pairs sorted by p-value, spread = y - intercept - hedge_ratio*x
+    """
+    prices = prices.dropna(axis=1)
+    params = (min_correlation, max_pvalue, adf_lags, _SCAN_VERSION)
+    key = _scan_key(prices, params)
+    cached = _cached_scan(key)
+    if cached is not None:
+        return cached
+
+    path = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f'pairs_{key}.csv')
+
+        if os.path.exists(path):
+            pairs = pd.read_csv(path, keep_default_na=False, dtype={'y': str, 'x': str})
+            _cache_scan(key, pairs)
+            return pairs.copy()
+
+    values = prices.to_numpy(dtype=float)
+    first, second, correlation, cov_matrix = candidate_pairs(values, min_correlation)
+
+    # one ordering per pair, independent of the column order: the more volatile stock is y
+    variance = np.diag(cov_matrix)
+    swap = variance[first] > variance[second]
+    y_idx = np.where(swap, first, second)
+    x_idx = np.where(swap, second, first)
+    means = values.mean(axis=0)
+    hedge_ratio = cov_matrix[x_idx, y_idx] / cov_matrix[x_idx, x_idx]
+    intercept = means[y_idx] - hedge_ratio*means[x_idx]
+
+    chunks = [
+        (y_idx[i:i+chunk_size], x_idx[i:i+chunk_size], intercept[i:i+chunk_size], hedge_ratio[i:i+chunk_size], adf_lags)
+        for i in range(0, len(y_idx), chunk_size)
+    ]
+    if n_jobs == 1 or len(chunks) <= 1:
+        results = [_scan_chunk(values, *chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_scan_worker, initargs=(values,)) as executor:
+            results = list(executor.map(_scan_chunk_worker, chunks))
+
+    if results:
+        adf_stat, gamma, spread_std = (np.concatenate(r) for r in zip(*results))
+    else:
+        adf_stat = gamma = spread_std = np.array([])
+
+    p_values = mackinnon_pvalues(adf_stat)
+
+    # periods for half of a deviation to revert, 0 if it reverts within one period
+    gamma = np.clip(gamma, -1, None)
+    with np.errstate(divide='ignore'):
+        half_life = np.where(gamma < 0, -np.log(2) / np.log1p(gamma), np.inf)
+
+    pairs = pd.DataFrame({
+        'y': prices.columns[y_idx].astype(str),
+        'x': prices.columns[x_idx].astype(str),
+        'correlation': correlation,
+        'hedge_ratio': hedge_ratio,
+        'intercept': intercept,
+        'spread_std': spread_std,
+        'adf_stat': adf_stat,
+        'p_value': p_values,
+        'half_life': half_life,
+    })
+    pairs = pairs[pairs['p_value'] <= max_pvalue].sort_values(['p_value', 'adf_stat'], ignore_index=True)
+
+    if path is not None:
+        pairs.to_csv(path, index=False)
+
+    _cache_scan(key, pairs)
+    return pairs.copy()
@@ -1,5 +1,13 @@
+import os
+import json
+import time
+import threading
 import yfinance as yf
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from .price_cache import PriceCache
 
 def get_fundamentals(ticker: str) -> dict:
     """Gets fundamental metrics for a given stock ticker
@@ -38,9 +46,14 @@ def get_fundamentals(ticker: str) -> dict:
             }
         }
     """
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    
+    return _parse_fundamentals(ticker, _yahoo_info(ticker))
+
+
+def _yahoo_info(ticker: str) -> dict:
+    return yf.Ticker(ticker).info
+
+
+def _parse_fundamentals(ticker: str, info: dict) -> dict:
     return {
         'stock_info': {
             'ticker': ticker,
@@ -83,18 +96,128 @@ def get_fundamentals(ticker: str) -> dict:
         }
     }
     
+
+class _RateLimiter:
+    def __init__(self, calls_per_second: float):
+        self.interval = 1 / calls_per_second if calls_per_second else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+        
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+            
+        if wait_time > 0:
+            time.sleep(wait_time)
+            
+
+def _read_cached_info(cache_dir: str, ticker: str, ttl: float) -> dict:
+    path = os.path.join(cache_dir, f'{ticker}.json')
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, 'r') as f:
+        cached = json.load(f)
+        
+    if time.time() - cached['fetched_at'] > ttl:
+        return None
+    
+    return cached['info']
+
+
+def _write_cached_info(cache_dir: str, ticker: str, info: dict) -> None:
+    path = os.path.join(cache_dir, f'{ticker}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'fetched_at': time.time(), 'info': info}, f, default=str)
+    os.replace(path + '.tmp', path)
+    
+
+def get_fundamentals_many(
+    tickers: list,
+    max_workers: int=8,
+    calls_per_second: float=5,
+    retries: int=3,
+    cache_dir: str=None,
+    ttl: float=86400,
+    provider: Callable=None,
+) -> Dict[str, dict]:
+    """Gets fundamental metrics for a list of stock tickers concurrently
+
+    Args:
+        tickers (list): list of stock tickers
+        max_workers (int, optional): number of concurrent lookups. Defaults to 8.
+        calls_per_second (float, optional): maximum rate of lookups, None for no limit. Defaults to 5.
+        retries (int, optional): number of attempts per ticker before giving up. Defaults to 3.
+        cache_dir (str, optional): folder to cache raw info payloads in. Defaults to None.
+        ttl (float, optional): seconds before a cached payload is fetched again. Defaults to 86400 (1 day).
+        provider (Callable, optional): function(ticker) -> info dict. Defaults to yfinance Ticker.info.
+
+    Returns:
+        Dict[str, dict]: {ticker: fundamentals} in the format of get_fundamentals(). 
+            tickers that could not be fetched are left out
+    """
+    provider = provider or _yahoo_info
+    rate_limiter = _RateLimiter(calls_per_second)
+    
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def fetch(ticker: str) -> dict:
+        if cache_dir is not None:
+            info = _read_cached_info(cache_dir, ticker, ttl)
+            if info is not None:
+                return info
+        
+        for attempt in range(retries):
+            rate_limiter.wait()
+            try:
+                info = provider(ticker)
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    print(f'Failed to get fundamentals for {ticker}: {e}')
+                    return None
+                time.sleep(2**attempt) # back off before retrying
+        
+        if cache_dir is not None:
+            _write_cached_info(cache_dir, ticker, info)
+            
+        return info
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        infos = list(executor.map(fetch, tickers))
+        
+    return {
+        ticker: _parse_fundamentals(ticker, info)
+        for ticker, info in zip(tickers, infos) if info is not None
+    }
+    
     
-def get_price_history(tickers: list, start_date: str, end_date: str, period='1d') -> pd.DataFrame:
+def get_price_history(
+    tickers: list, 
+    start_date: str, 
+    end_date: str, 
+    period='1d',
+    cache_dir: str=None,
+    offline: bool=False,
+) -> pd.DataFrame:
     """Gets historical prices for a list of stock tickers
 
     Args:
         tickers (list): list of stock tickers
         start_date (str): start date for historical data
         end_date (str): end date for historical data
+        cache_dir (str, optional): folder of the local price cache. only missing dates are downloaded. Defaults to None.
+        offline (bool, optional): only read prices from cache_dir, never download. Defaults to False.
 
     Returns:
         pd.DataFrame: historical prices of the stocks
     """
+    if cache_dir is not None:
+        return PriceCache(cache_dir, period=period, offline=offline).get(tickers, start_date, end_date)
+    
     data = yf.download(tickers, start=start_date, end=end_date, period=period)
     data = data['Adj Close']
     
@@ -113,18 +236,80 @@ def get_tickers(filename: str) -> list:
     return pd.read_csv(f'../data/{filename}.csv')['ticker'].tolist()
 
 
-def get_risk_free_rate(start_date: str, end_date: str) -> pd.Series:
+_risk_free_cache = {}
+
+def get_risk_free_rate(start_date: str, end_date: str, cache_dir: str=None, retries: int=3) -> pd.Series:
     """Gets the risk-free rate for a given time period
         Uses the 10 year treasury yield as a proxy
+        Results are cached in memory, and on disk if cache_dir is given. Failed or empty
+        downloads are retried and never cached
 
     Args:
         start_date (str): start date for the risk-free rate
         end_date (str): end date for the risk-free rate
+        cache_dir (str, optional): folder to cache the rates in. Defaults to None.
+        retries (int, optional): number of download attempts before giving up. Defaults to 3.
+
+    Raises:
+        ValueError: if no rates could be downloaded for the period
 
     Returns:
         pd.Series: risk-free rate for the given time period
     """
-    treasury = yf.Ticker('^TNX')
-    data = treasury.history(start=start_date, end=end_date)
+    key = (pd.Timestamp(start_date).strftime('%Y-%m-%d'), pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+    if key in _risk_free_cache:
+        return _risk_free_cache[key]
+    
+    path = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f'risk_free_{key[0]}_{key[1]}.csv')
+    
+    rates = None
+    if path is not None and os.path.exists(path):
+        rates = pd.read_csv(path, index_col=0, parse_dates=True).iloc[:, 0].dropna()
+    
+    if rates is None or rates.empty:
+        rates = _download_risk_free_rate(key[0], key[1], retries)
+        if path is not None:
+            rates.to_csv(path)
+    
+    _risk_free_cache[key] = rates
+    return rates
+
+
+def _download_risk_free_rate(start_date: str, end_date: str, retries: int) -> pd.Series:
+    error = None
+    for attempt in range(retries):
+        try:
+            data = yf.Ticker('^TNX').history(start=start_date, end=end_date)
+            if 'Close' in data and not data['Close'].dropna().empty:
+                return data['Close'].dropna()/100
+        except Exception as e:
+            error = e
+        
+        if attempt < retries - 1:
+            time.sleep(2**attempt) # back off before retrying
+    
+    raise ValueError(f'No risk-free rates for {start_date} to {end_date}') from error
+
+
+def align_risk_free_rate(risk_free_rate: pd.Series, index: pd.DatetimeIndex) -> pd.Series:
+    """Aligns a risk-free rate series to the dates of another series
+        Missing dates are filled with the last (or next) available rate
+
+    Args:
+        risk_free_rate (pd.Series): risk-free rate
+        index (pd.DatetimeIndex): dates to align to
+
+    Returns:
+        pd.Series: risk-free rate on each date of index
+    """
+    risk_free_rate = risk_free_rate.copy()
+    if risk_free_rate.index.tz is not None:
+        risk_free_rate.index = risk_free_rate.index.tz_localize(None)
+    risk_free_rate.index = risk_free_rate.index.normalize()
+    risk_free_rate = risk_free_rate[~risk_free_rate.index.duplicated(keep='last')]
     
-    return data['Close']/100
\ No newline at end of file
+    combined_index = risk_free_rate.index.union(index)
+    return risk_free_rate.reindex(combined_index).ffill().bfill().reindex(index)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+from typing import Tuple
+
+def _frontier_coefficients(
+    expected_returns: np.array,
+    inv_ones: np.array,
+    inv_mu: np.array
+) -> Tuple[np.array, ...]:
+    # scalars of the frontier from sigma^-1 1 and sigma^-1 mu
+    a = np.sum(inv_ones, axis=-1)
+    b = np.sum(inv_mu, axis=-1)
+    c = np.sum(expected_returns*inv_mu, axis=-1)
+
+    return a, b, c
+
+
+def _solve_frontier(expected_returns: np.array, cov_matrix: np.array) -> Tuple[np.array, ...]:
+    # solve sigma^-1 [1, mu] once per scenario, reused for every frontier point
+    ones = np.ones_like(expected_returns)
+    rhs = np.stack([ones, expected_returns], axis=-1)
+    solved = np.linalg.solve(cov_matrix, rhs)
+
+    return solved[..., 0], solved[..., 1]
+
+
+def _frontier_weights(
+    inv_ones: np.array,
+    inv_mu: np.array,
+    a: np.array,
+    b: np.array,
+    c: np.array,
+    target_returns: np.array
+) -> Tuple[np.array, np.array]:
+    # weights are a mix of sigma^-1 1 and sigma^-1 mu for each target
+    d = a*c - b**2
+    a, b, c, d = (np.asarray(x)[..., None] for x in (a, b, c, d))
+    lambda_ones = (c - b*target_returns) / d
+    lambda_mu = (a*target_returns - b) / d
+    weights = lambda_ones[..., None]*inv_ones[..., None, :] + lambda_mu[..., None]*inv_mu[..., None, :]
+    variance = (a*target_returns**2 - 2*b*target_returns + c) / d
+
+    return weights, np.sqrt(variance)
+
+
+def _tangency_from_solution(z: np.array, expected_returns: np.array) -> Tuple[np.array, np.array]:
+    # z = sigma^-1 (mu - rf), normalized to sum to 1. A non-positive sum is the minimum
+    # sharpe ratio solution, not the tangent portfolio, so those scenarios are NaN
+    total = np.sum(z, axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(total > 0, z / total, np.nan)
+
+    return weights, np.sum(weights*expected_returns, axis=-1)
+
+
+def batch_frontier(
+    expected_returns: np.array,
+    cov_matrix: np.array,
+    target_returns: np.array
+) -> Tuple[np.array, np.array]:
+    """ Finds minimum variance portfolios (short sales allowed) for many target returns
+        and scenarios in one vectorized solve
+
+    Args:
+        expected_returns (np.array): expected returns (n_assets) or stacked scenarios (n_scenarios, n_assets)
+        cov_matrix (np.array): covariance matrix (n_assets, n_assets) or (n_scenarios, n_assets, n_assets)
+        target_returns (np.array): target portfolio returns (n_points) or (n_scenarios, n_points)
+
+    Returns:
+        Tuple[np.array, np.array]: weights (..., n_points, n_assets), portfolio std (..., n_points)
+    """
+    expected_returns = np.asarray(expected_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    target_returns = np.asarray(target_returns, dtype=float)
+
+    inv_ones, inv_mu = _solve_frontier(expected_returns, cov_matrix)
+    a, b, c = _frontier_coefficients(expected_returns, inv_ones, inv_mu)
+
+    return _frontier_weights(inv_ones, inv_mu, a, b, c, target_returns)
+
+
+def batch_tangency(
+    expected_returns: np.array,
+    cov_matrix: np.array,
+    risk_free_rate: np.array
+) -> Tuple[np.array, np.array]:
+    """ Finds tangent portfolios (short sales allowed) for stacked scenarios in one vectorized solve,
+        e.g. the inputs of every rebalance of a backtest. All scenarios need the same number of assets
+
+    Args:
+        expected_returns (np.array): expected returns (n_scenarios, n_assets)
+        cov_matrix (np.array): covariance matrices (n_scenarios, n_assets, n_assets)
+        risk_free_rate (np.array): risk free rate, a float or one per scenario (n_scenarios)
+
+    Returns:
+        Tuple[np.array, np.array]: weights (n_scenarios, n_assets), expected returns of portfolios (n_scenarios).
+            Scenarios with no tangent portfolio (sigma^-1 (mu - rf) sums to 0 or less) are NaN
+    """
+    expected_returns = np.asarray(expected_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    risk_free_rate = np.asarray(risk_free_rate, dtype=float)
+
+    excess_returns = expected_returns - risk_free_rate[..., None]
+    z = np.linalg.solve(cov_matrix, excess_returns[..., None])[..., 0]
+
+    return _tangency_from_solution(z, expected_returns)
+
+
+def efficient_frontier(
+    expected_returns: np.array,
+    cov_matrix: np.array,
+    risk_free_rate: float,
+    n_points: int=50,
+    target_returns: np.array=None,
+    tickers: list=None,
+) -> dict:
+    """ Computes the efficient frontier (short sales allowed) using Modern Portfolio Theory
+        All points and the tangent portfolio come from a single Cholesky factorization
+        of the covariance matrix
+
+    Args:
+        expected_returns (np.array): expected returns of assets
+        cov_matrix (np.array): covariance matrix of assets
+        risk_free_rate (float): risk free rate
+        n_points (int, optional): number of frontier points between the minimum variance
+            portfolio and the highest expected return. Defaults to 50.
+        target_returns (np.array, optional): target returns to use instead of n_points. Defaults to None.
+        tickers (list, optional): names of the assets. Defaults to None.
+
+    Returns:
+        dict: frontier points, minimum variance portfolio and tangent portfolio.
+            The tangent portfolio is NaN if there is none (risk_free_rate above the minimum variance return)
+    """
+    expected_returns = np.asarray(expected_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    tickers = tickers if tickers is not None else list(range(len(expected_returns)))
+
+    # sigma^-1 [1, mu] from one factorization; the tangent portfolio is
+    # sigma^-1 (mu - rf) = sigma^-1 mu - rf sigma^-1 1, so it needs no extra solve
+    solved = cho_solve(cho_factor(cov_matrix), np.column_stack([np.ones_like(expected_returns), expected_returns]))
+    inv_ones, inv_mu = solved[:, 0], solved[:, 1]
+    a, b, c = _frontier_coefficients(expected_returns, inv_ones, inv_mu)
+    min_var_weights = inv_ones / a
+    min_var_return = b / a
+
+    if target_returns is None:
+        target_returns = np.linspace(min_var_return, np.max(expected_returns), n_points)
+    weights, std = _frontier_weights(inv_ones, inv_mu, a, b, c, np.asarray(target_returns, dtype=float))
+
+    tangent_weights, tangent_return = _tangency_from_solution(inv_mu - risk_free_rate*inv_ones, expected_returns)
+    tangent_std = np.sqrt(tangent_weights @ cov_matrix @ tangent_weights)
+
+    frontier = pd.DataFrame(weights, columns=tickers)
+    frontier.insert(0, 'std', std)
+    frontier.insert(0, 'return', target_returns)
+    frontier['sharpe_ratio'] = (frontier['return'] - risk_free_rate) / frontier['std']
+
+    return {
+        'frontier': frontier,
+        'min_variance': {
+            'weights': dict(zip(tickers, min_var_weights)),
+            'return': min_var_return,
+            'std': np.sqrt(1 / a),
+        },
+        'tangency': {
+            'weights': dict(zip(tickers, tangent_weights)),
+            'return': tangent_return,
+            'std': tangent_std,
+            'sharpe_ratio': (tangent_return - risk_free_rate) / tangent_std,
+        },
+    }
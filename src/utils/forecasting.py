@@ -0,0 +1,141 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from statsmodels.tsa.arima.model import ARIMA
+from pmdarima.arima import auto_arima
+from typing import Dict
+
+class ArimaForecaster:
+    def __init__(
+        self,
+        reselect_every: int=1,
+        llf_tolerance: float=0.05,
+        n_jobs: int=None,
+    ):
+        """ Initializes a 1 step ahead ARIMA forecaster for rolling windows
+            The order found by auto_arima is cached per series and reused for the
+            next windows, warm-starting each fit from the previous window's parameters
+
+        Args:
+            reselect_every (int, optional): windows between order searches.
+                1 searches every window (same as forecast_arima). Defaults to 1.
+            llf_tolerance (float, optional): drop in log-likelihood per observation
+                that triggers a new order search. Defaults to 0.05.
+            n_jobs (int, optional): series to forecast in parallel. Defaults to None (one per series).
+        """
+        self.reselect_every = reselect_every
+        self.llf_tolerance = llf_tolerance
+        self.n_jobs = n_jobs
+        self._states = {}
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self) -> dict:
+        # locks can't be pickled, e.g. when sent to worker processes
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+    def _select_and_fit(self, data: pd.Series):
+        model_order = auto_arima(
+            data,
+            seasonal=False,
+            stepwise=True,
+            supress_warnings=True,
+        ).order
+
+        return ARIMA(data, order=model_order).fit()
+
+
+    def _refit(self, data: pd.Series, state: dict):
+        # a failed warm-started fit falls back to a new order search, like a degraded one.
+        # some errors (e.g. start_params of the wrong length) only surface when the results are read
+        try:
+            results = ARIMA(data, order=state['order']).fit(start_params=state['params'])
+            params = results.params
+            llf_per_obs = results.llf / results.nobs
+            converged = results.mle_retvals.get('converged', True) if results.mle_retvals else True
+        except (np.linalg.LinAlgError, ValueError):
+            return None
+
+        # search for a new order if the cached one no longer fits
+        degraded = llf_per_obs < state['llf_per_obs'] - self.llf_tolerance
+        finite = np.isfinite(llf_per_obs) and np.all(np.isfinite(params))
+        if not converged or degraded or not finite:
+            return None
+
+        return results
+
+
+    def forecast(self, data: pd.Series, name: str=None) -> dict:
+        """ Forecasts a series 1 step ahead, reusing the cached order of the series if available
+
+        Args:
+            data (pd.Series): time series data
+            name (str, optional): key of the cached order. Defaults to data.name.
+
+        Returns:
+            dict: date of forecast and forecasted value
+        """
+        name = data.name if name is None else name
+        with self._lock:
+            state = self._states.get(name)
+
+        results = None
+        windows_since_selection = 0
+        if state is not None and state['windows_since_selection'] + 1 < self.reselect_every:
+            results = self._refit(data, state)
+            windows_since_selection = state['windows_since_selection'] + 1
+
+        if results is None:
+            results = self._select_and_fit(data)
+            windows_since_selection = 0
+
+        with self._lock:
+            self._states[name] = {
+                'order': results.model.order,
+                'params': results.params,
+                'llf_per_obs': results.llf / results.nobs,
+                'windows_since_selection': windows_since_selection,
+            }
+
+        forecast = results.forecast(steps=1)
+
+        return {
+            'date': forecast.index[0].strftime('%Y-%m-%d'),
+            'forecast': forecast.iloc[0]
+        }
+
+
+    def forecast_many(self, data: pd.DataFrame) -> Dict[str, float]:
+        """ Forecasts each column of a dataframe 1 step ahead in parallel
+
+        Args:
+            data (pd.DataFrame): time series data, one series per column
+
+        Returns:
+            Dict[str, float]: {column: forecasted value}
+        """
+        n_jobs = self.n_jobs or min(len(data.columns), os.cpu_count() or 1)
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            forecasts = executor.map(lambda col: self.forecast(data[col], col), data.columns)
+
+            return {
+                col: forecast['forecast'] for col, forecast in zip(data.columns, forecasts)
+            }
+
+
+    def reset(self) -> None:
+        """ Clears the cached orders and parameters
+        """
+        with self._lock:
+            self._states = {}
@@ -1,19 +1,31 @@
 import pandas as pd
 
-from .data_loader import get_fundamentals
+from .data_loader import get_fundamentals, get_fundamentals_many
 
-def compare_to_market(ticker: str, market_tickers: list) -> dict:
+def compare_to_market(
+    ticker: str, 
+    market_tickers: list,
+    cache_dir: str=None,
+    max_workers: int=8,
+) -> dict:
     """ Compares the fundamentals of a stock to the average of the market and sector
 
     Args:
         ticker (str): ticker of the stock
         market_tickers (list): list of tickers in the market
+        cache_dir (str, optional): folder to cache fundamentals in, see get_fundamentals_many(). Defaults to None.
+        max_workers (int, optional): number of concurrent lookups. Defaults to 8.
 
     Returns:
         dict: stock info and metrics compared to market and sector
     """
     info = get_fundamentals(ticker)
-    market_info = calculate_market_sector_mean(market_tickers, info["stock_info"]["sector"])
+    market_info = calculate_market_sector_mean(
+        market_tickers, 
+        info["stock_info"]["sector"],
+        cache_dir=cache_dir,
+        max_workers=max_workers,
+    )
     stock_metrics = info['metrics']
     
     market_info[ticker] = stock_metrics
@@ -31,18 +43,25 @@ def compare_to_market(ticker: str, market_tickers: list) -> dict:
         'analyst_expectations': market_info.loc[['analyst_median_growth', 'recommendation_mean']],
     }
     
-def calculate_market_sector_mean(tickers: list, sector: str) -> pd.DataFrame:
+def calculate_market_sector_mean(
+    tickers: list, 
+    sector: str,
+    cache_dir: str=None,
+    max_workers: int=8,
+) -> pd.DataFrame:
     """Calculates the average metrics of a list of stocks and average of a given sector
 
     Args:
         tickers (list): list of stock tickers
         sector (str): sector to calculate the averages for
+        cache_dir (str, optional): folder to cache fundamentals in, see get_fundamentals_many(). Defaults to None.
+        max_workers (int, optional): number of concurrent lookups. Defaults to 8.
 
     Returns:
-        pd.DataFrame: average metrics of the stocks and sector. uses metrics from get_metrics()
+        pd.DataFrame: average metrics of the stocks and sector. uses metrics from get_fundamentals()
     """
-    data = [get_metrics(ticker) for ticker in tickers]
-    df = pd.DataFrame([d['metrics'] for d in data])
+    data = get_fundamentals_many(tickers, max_workers=max_workers, cache_dir=cache_dir)
+    df = pd.DataFrame([d['metrics'] for d in data.values()])
     
     average = {}
     sector_df = df[df['sector'] == sector].copy()
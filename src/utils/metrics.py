@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Union
+
+PERIODS_PER_YEAR = {'D': 252, 'W': 52, 'MS': 12}
+
+def _as_matrix(returns: Union[np.ndarray, pd.Series, pd.DataFrame]) -> np.ndarray:
+    values = np.asarray(returns, dtype=float)
+    return values[:, None] if values.ndim == 1 else values
+
+
+def _labels(returns: Union[np.ndarray, pd.Series, pd.DataFrame], n_columns: int) -> pd.Index:
+    if isinstance(returns, pd.DataFrame):
+        return returns.columns
+    if isinstance(returns, pd.Series):
+        return pd.Index([returns.name])
+
+    return pd.RangeIndex(n_columns)
+
+
+def _longest_run(mask: np.ndarray) -> np.ndarray:
+    # longest stretch of consecutive True values in each column
+    counts = np.cumsum(mask, axis=0)
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=0)
+
+    return (counts - resets).max(axis=0, initial=0)
+
+
+def batch_metrics(
+    returns: np.ndarray,
+    periods_per_year: int=252,
+    risk_free_rate: float=0.0,
+    extended: bool=True,
+) -> Dict[str, np.ndarray]:
+    """ Performance metrics of many return series at once
+        Missing returns are skipped, so series can start and end at different dates
+
+    Args:
+        returns (np.ndarray): simple returns (periods, series)
+        periods_per_year (int, optional): periods in a year, to annualize. Defaults to 252.
+        risk_free_rate (float, optional): annual risk-free rate. Defaults to 0.0.
+        extended (bool, optional): also compute sortino and calmar ratios, skew, kurtosis and
+            max drawdown duration. Without them, e.g. in parameter sweeps, metrics are several times faster.
+            Defaults to True.
+
+    Returns:
+        Dict[str, np.ndarray]: each metric for every series
+    """
+    returns = _as_matrix(returns)
+    valid = ~np.isnan(returns)
+    complete = valid.all()
+    count = len(returns) if complete else valid.sum(axis=0)
+    filled = returns if complete else np.where(valid, returns, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_returns = np.exp(np.sum(np.log1p(filled), axis=0) / count) - 1
+        annual_returns = (1+average_returns)**periods_per_year - 1
+
+        deviations = filled - np.sum(filled, axis=0) / count
+        if not complete:
+            deviations[~valid] = 0.0
+        m2 = np.einsum('ij,ij->j', deviations, deviations)
+        annual_std = np.sqrt(m2 / count * periods_per_year)
+
+        growth = 1 + filled
+        np.cumprod(growth, axis=0, out=growth)
+        running_max = np.maximum.accumulate(growth, axis=0)
+        max_drawdown = np.min(growth / running_max, axis=0, initial=1) - 1
+
+        excess_returns = annual_returns - risk_free_rate
+        metrics = {
+            'total_returns': growth[-1] - 1 if len(growth) else np.zeros(returns.shape[1]),
+            'average_returns': average_returns,
+            'annual_returns': annual_returns,
+            'annual_std': annual_std,
+            'sharpe_ratio': excess_returns / annual_std,
+            'max_drawdown': max_drawdown,
+        }
+        if not extended:
+            return metrics
+
+        # skew and kurtosis with the same bias corrections as pandas
+        squares = deviations**2
+        m3 = np.einsum('ij,ij->j', squares, deviations)
+        m4 = np.einsum('ij,ij->j', squares, squares)
+        skew = count * (count-1)**0.5 / (count-2) * m3 / m2**1.5
+        kurtosis = (
+            count * (count+1) * (count-1) * m4 / ((count-2) * (count-3) * m2**2)
+            - 3 * (count-1)**2 / ((count-2) * (count-3))
+        )
+        skew = np.where(count < 3, np.nan, np.where(m2 == 0, 0.0, skew))
+        kurtosis = np.where(count < 4, np.nan, np.where(m2 == 0, 0.0, kurtosis))
+
+        # downside deviation below the risk-free rate of each period
+        shortfall = np.minimum(filled - risk_free_rate/periods_per_year, 0.0)
+        if not complete:
+            shortfall[~valid] = 0.0
+        downside_std = np.sqrt(np.sum(shortfall**2, axis=0) / count * periods_per_year)
+
+        metrics.update({
+            'sortino_ratio': excess_returns / downside_std,
+            'calmar_ratio': annual_returns / -max_drawdown,
+            'skew': skew,
+            'kurtosis': kurtosis,
+            # periods spent below the last peak
+            'max_drawdown_duration': _longest_run(growth < running_max),
+        })
+
+    return metrics
+
+
+def performance_metrics(
+    returns: Union[np.ndarray, pd.Series, pd.DataFrame],
+    data_freq: str='D',
+    risk_free_rate: float=0.0,
+) -> pd.DataFrame:
+    """ Table of performance metrics, one row per return series
+
+    Args:
+        returns (Union[np.ndarray, pd.Series, pd.DataFrame]): simple returns (periods, series)
+        data_freq (str, optional): frequency of returns (D, W, MS), to annualize. Defaults to 'D'.
+        risk_free_rate (float, optional): annual risk-free rate. Defaults to 0.0.
+
+    Returns:
+        pd.DataFrame: metrics (columns) of each series (rows)
+    """
+    values = _as_matrix(returns)
+    metrics = batch_metrics(values, PERIODS_PER_YEAR.get(data_freq, 1), risk_free_rate)
+
+    return pd.DataFrame(metrics, index=_labels(returns, values.shape[1]))
+
+
+def rolling_metrics(
+    returns: Union[np.ndarray, pd.Series, pd.DataFrame],
+    window: int,
+    data_freq: str='D',
+    risk_free_rate: float=0.0,
+    chunk_size: int=2**22,
+) -> pd.DataFrame:
+    """ Annualized return, volatility, sharpe ratio and max drawdown over a rolling window
+        Means come from cumulative sums, drawdowns are computed on blocks of windows
+
+    Args:
+        returns (Union[np.ndarray, pd.Series, pd.DataFrame]): simple returns without missing values (periods, series)
+        window (int): periods in each window
+        data_freq (str, optional): frequency of returns (D, W, MS), to annualize. Defaults to 'D'.
+        risk_free_rate (float, optional): annual risk-free rate. Defaults to 0.0.
+        chunk_size (int, optional): maximum values held for the drawdown blocks. Defaults to 2**22.
+
+    Returns:
+        pd.DataFrame: metric of each series at the end of each window, NaN before the first full window.
+            Columns are (metric, series)
+    """
+    values = _as_matrix(returns)
+    n_periods, n_series = values.shape
+    periods_per_year = PERIODS_PER_YEAR.get(data_freq, 1)
+    n_windows = max(n_periods - window + 1, 0)
+
+    def window_sums(x: np.ndarray) -> np.ndarray:
+        sums = np.cumsum(np.vstack([np.zeros((1, n_series)), x]), axis=0)
+        return sums[window:] - sums[:-window]
+
+    # centered values keep the sums of squares accurate
+    centered = values - values.mean(axis=0)
+    mean = window_sums(centered) / window
+    variance = np.maximum(window_sums(centered**2) / window - mean**2, 0)
+    annual_std = np.sqrt(variance * periods_per_year)
+    annual_returns = np.exp(window_sums(np.log1p(values)) / window)**periods_per_year - 1
+
+    max_drawdown = np.empty((n_windows, n_series))
+    windows = sliding_window_view(values, window, axis=0)
+    step = max(chunk_size // max(window*n_series, 1), 1)
+    for start in range(0, n_windows, step):
+        growth = np.cumprod(1 + windows[start:start+step], axis=-1)
+        running_max = np.maximum.accumulate(growth, axis=-1)
+        max_drawdown[start:start+step] = ((growth - running_max) / running_max).min(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'annual_returns': annual_returns,
+            'annual_std': annual_std,
+            'sharpe_ratio': (annual_returns - risk_free_rate) / annual_std,
+            'max_drawdown': max_drawdown,
+        }
+
+    index = returns.index if isinstance(returns, (pd.Series, pd.DataFrame)) else pd.RangeIndex(n_periods)
+    columns = _labels(returns, n_series)
+    padding = np.full((n_periods - n_windows, n_series), np.nan)
+
+    return pd.concat(
+        {key: pd.DataFrame(np.vstack([padding, value]), index=index, columns=columns) for key, value in metrics.items()},
+        axis=1,
+    )
@@ -0,0 +1,555 @@
+import numpy as np
+from typing import Tuple, Union
+
+class RunningMoments:
+    def __init__(self):
+        """ Initializes a running mean and variance (Welford's algorithm)
+            Batches are combined with Chan's parallel update, so memory does not grow with
+            the number of values and two accumulators can be merged
+        """
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+
+    def _combine(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        if total == 0:
+            return
+
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+
+    def update(self, values: Union[float, np.ndarray]) -> None:
+        """ Adds values to the accumulator
+
+        Args:
+            values (Union[float, np.ndarray]): new value or batch of values
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+
+        batch_mean = values.mean()
+        self._combine(len(values), batch_mean, np.sum((values - batch_mean)**2))
+
+
+    def merge(self, other: 'RunningMoments') -> None:
+        """ Adds the values of another accumulator
+
+        Args:
+            other (RunningMoments): accumulator to merge into this one
+        """
+        self._combine(other.count, other.mean, other._m2)
+
+
+    def variance(self, ddof: int=0) -> float:
+        """ Variance of the values so far
+
+        Args:
+            ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+        Returns:
+            float: variance, NaN without enough values
+        """
+        if self.count <= ddof:
+            return np.nan
+
+        return self._m2 / (self.count - ddof)
+
+
+    def std(self, ddof: int=0) -> float:
+        """ Standard deviation of the values so far
+
+        Args:
+            ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+        Returns:
+            float: standard deviation, NaN without enough values
+        """
+        return np.sqrt(self.variance(ddof))
+
+
+class ReservoirQuantiles:
+    def __init__(self, capacity: int=10000, seed: Union[int, np.random.SeedSequence]=None):
+        """ Initializes a quantile sketch using a uniform reservoir sample
+            Quantiles are exact until capacity values have been added, and estimated from
+            a uniform sample of the values after that
+
+        Args:
+            capacity (int, optional): maximum number of values kept. Defaults to 10000.
+            seed (Union[int, np.random.SeedSequence], optional): seed of the sampling. Defaults to None.
+        """
+        self.capacity = capacity
+        self.count = 0
+        self._sample = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+
+    def update(self, values: Union[float, np.ndarray]) -> None:
+        """ Adds values to the sketch
+
+        Args:
+            values (Union[float, np.ndarray]): new value or batch of values
+        """
+        values = np.asarray(values, dtype=float).ravel()
+
+        # fill the reservoir first
+        n_fill = min(len(values), self.capacity - len(self._sample))
+        if n_fill > 0:
+            self._sample = np.concatenate([self._sample, values[:n_fill]])
+            self.count += n_fill
+            values = values[n_fill:]
+
+        if len(values) == 0:
+            return
+
+        # the i-th value replaces a random slot with probability capacity / i
+        positions = self.count + 1 + np.arange(len(values))
+        slots = self._rng.integers(0, positions)
+        keep = slots < self.capacity
+        for slot, value in zip(slots[keep], values[keep]):
+            self._sample[slot] = value
+        self.count += len(values)
+
+
+    def merge(self, other: 'ReservoirQuantiles') -> None:
+        """ Adds the values of another sketch, keeping a uniform sample of both
+
+        Args:
+            other (ReservoirQuantiles): sketch to merge into this one
+        """
+        total = self.count + other.count
+        if len(self._sample) + len(other._sample) <= self.capacity:
+            self._sample = np.concatenate([self._sample, other._sample])
+        else:
+            # values drawn from each sketch in proportion to the values it has seen
+            n_self = self._rng.hypergeometric(self.count, other.count, self.capacity)
+            n_self = min(n_self, len(self._sample))
+            n_other = min(self.capacity - n_self, len(other._sample))
+            self._sample = np.concatenate([
+                self._rng.choice(self._sample, n_self, replace=False),
+                self._rng.choice(other._sample, n_other, replace=False),
+            ])
+        self.count = total
+
+
+    def quantile(self, q: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """ Estimates quantiles of the values so far
+
+        Args:
+            q (Union[float, np.ndarray]): percentiles between 0 and 100
+
+        Returns:
+            Union[float, np.ndarray]: estimated percentiles, same as np.percentile until capacity is reached
+        """
+        if len(self._sample) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+
+        return np.percentile(self._sample, q)
+
+
+def _as_bars(values: Union[float, np.ndarray]) -> np.ndarray:
+    # one bar (columns,) or a block of bars (bars, columns)
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 0:
+        return values.reshape(1, 1)
+    if values.ndim == 1:
+        return values[None, :]
+
+    return values
+
+
+def _as_columns(values: np.ndarray) -> np.ndarray:
+    # a series of bars (bars,) or many series (bars, columns)
+    values = np.asarray(values, dtype=float)
+    return values[:, None] if values.ndim == 1 else values
+
+
+class _RollingWindow:
+    def __init__(self, window: int=None):
+        # bars leaving the window are kept in a ring buffer, so they can be removed in O(1)
+        self.window = window
+        self.count = 0
+        self._buffer = None
+        self._position = 0
+
+
+    def _push(self, *bar: np.ndarray) -> None:
+        if self.window is not None:
+            if self._buffer is None:
+                self._buffer = [np.empty((self.window,) + np.shape(x)) for x in bar]
+            if self.count == self.window:
+                self._remove(*(buffer[self._position] for buffer in self._buffer))
+            for buffer, x in zip(self._buffer, bar):
+                buffer[self._position] = x
+            self._position = (self._position + 1) % self.window
+
+        self._add(*bar)
+
+
+    def _update(self, *bars: np.ndarray) -> None:
+        n_bars = len(bars[0])
+        if n_bars == 0:
+            return
+
+        if n_bars == 1:
+            self._push(*(x[0] for x in bars))
+        elif self.window is None:
+            # expanding: merge the whole block at once
+            self._merge_block(*bars)
+        elif n_bars >= self.window:
+            # the block covers the window: restart from its last bars
+            last = [x[-self.window:] for x in bars]
+            self._reset()
+            self._merge_block(*last)
+            self._buffer = [x.copy() for x in last]
+            self._position = 0
+        else:
+            for bar in zip(*bars):
+                self._push(*bar)
+
+
+class RollingMoments(_RollingWindow):
+    def __init__(self, window: int=None):
+        """ Initializes a rolling mean and variance of many columns (Welford's algorithm)
+            Each bar is added, and the bar leaving the window removed, in O(1) per column.
+            Expanding over all bars if window is None
+
+        Args:
+            window (int, optional): bars in the window. Defaults to None (expanding).
+        """
+        super().__init__(window)
+        self._reset()
+
+
+    def _reset(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+
+    def _add(self, x: np.ndarray) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean = self.mean + delta / self.count
+        self._m2 = self._m2 + delta * (x - self.mean)
+
+
+    def _remove(self, x: np.ndarray) -> None:
+        self.count -= 1
+        if self.count == 0:
+            self._reset()
+            return
+
+        delta = x - self.mean
+        self.mean = self.mean - delta / self.count
+        self._m2 = self._m2 - delta * (x - self.mean)
+
+
+    def _merge_block(self, x: np.ndarray) -> None:
+        # Chan's parallel update with the moments of the block
+        count = len(x)
+        mean = x.mean(axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.mean = self.mean + delta * count / total
+        self._m2 = self._m2 + np.sum((x - mean)**2, axis=0) + delta**2 * self.count * count / total
+        self.count = total
+
+
+    def update(self, values: Union[float, np.ndarray]) -> None:
+        """ Adds bars to the accumulator
+
+        Args:
+            values (Union[float, np.ndarray]): one bar (columns,) or a block of bars (bars, columns)
+        """
+        self._update(_as_bars(values))
+
+
+    def variance(self, ddof: int=0) -> np.ndarray:
+        """ Variance of each column over the window
+
+        Args:
+            ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+        Returns:
+            np.ndarray: variances, NaN without enough bars
+        """
+        if self.count <= ddof:
+            return np.full(np.shape(self.mean), np.nan)
+
+        # removals can leave tiny negative rounding errors
+        return np.maximum(self._m2, 0) / (self.count - ddof)
+
+
+    def std(self, ddof: int=0) -> np.ndarray:
+        """ Standard deviation of each column over the window
+
+        Args:
+            ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+        Returns:
+            np.ndarray: standard deviations, NaN without enough bars
+        """
+        return np.sqrt(self.variance(ddof))
+
+
+class RollingCovariance(_RollingWindow):
+    def __init__(self, window: int=None):
+        """ Initializes a rolling covariance and regression beta of many columns against
+            a benchmark (e.g. stock returns against market returns)
+            Each bar is added, and the bar leaving the window removed, in O(1) per column.
+            Expanding over all bars if window is None
+
+        Args:
+            window (int, optional): bars in the window. Defaults to None (expanding).
+        """
+        super().__init__(window)
+        self._reset()
+
+
+    def _reset(self) -> None:
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self._m2_x = 0.0
+        self._m2_y = 0.0
+        self._c = 0.0
+
+
+    def _add(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.count += 1
+        delta_x = x - self.mean_x
+        delta_y = y - self.mean_y
+        self.mean_x = self.mean_x + delta_x / self.count
+        self.mean_y = self.mean_y + delta_y / self.count
+        self._m2_x = self._m2_x + delta_x * (x - self.mean_x)
+        self._m2_y = self._m2_y + delta_y * (y - self.mean_y)
+        self._c = self._c + delta_x * (y - self.mean_y)
+
+
+    def _remove(self, x: np.ndarray, y: np.ndarray) -> None:
+        self.count -= 1
+        if self.count == 0:
+            self._reset()
+            return
+
+        delta_x = x - self.mean_x
+        delta_y = y - self.mean_y
+        self.mean_x = self.mean_x - delta_x / self.count
+        self.mean_y = self.mean_y - delta_y / self.count
+        self._m2_x = self._m2_x - delta_x * (x - self.mean_x)
+        self._m2_y = self._m2_y - delta_y * (y - self.mean_y)
+        self._c = self._c - (x - self.mean_x) * delta_y
+
+
+    def _merge_block(self, x: np.ndarray, y: np.ndarray) -> None:
+        # Chan's parallel update with the co-moments of the block
+        count = len(x)
+        mean_x = x.mean(axis=0)
+        mean_y = y.mean(axis=0)
+        total = self.count + count
+        delta_x = mean_x - self.mean_x
+        delta_y = mean_y - self.mean_y
+        weight = self.count * count / total
+
+        self.mean_x = self.mean_x + delta_x * count / total
+        self.mean_y = self.mean_y + delta_y * count / total
+        self._m2_x = self._m2_x + np.sum((x - mean_x)**2, axis=0) + delta_x**2 * weight
+        self._m2_y = self._m2_y + np.sum((y - mean_y)**2, axis=0) + delta_y**2 * weight
+        self._c = self._c + np.sum((x - mean_x) * (y - mean_y), axis=0) + delta_x * delta_y * weight
+        self.count = total
+
+
+    def update(self, x: Union[float, np.ndarray], y: Union[float, np.ndarray]) -> None:
+        """ Adds bars to the accumulator
+
+        Args:
+            x (Union[float, np.ndarray]): one bar (columns,) or a block of bars (bars, columns)
+            y (Union[float, np.ndarray]): benchmark, same shape as x or one value per bar
+        """
+        x = _as_bars(x)
+        y = np.asarray(y, dtype=float)
+        # one benchmark value per bar of a block
+        y = y[:, None] if y.ndim == 1 and len(x) > 1 else _as_bars(y)
+        self._update(x, np.broadcast_to(y, x.shape))
+
+
+    def covariance(self, ddof: int=0) -> np.ndarray:
+        """ Covariance of each column with the benchmark over the window
+
+        Args:
+            ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+        Returns:
+            np.ndarray: covariances, NaN without enough bars
+        """
+        if self.count <= ddof:
+            return np.full(np.shape(self.mean_x), np.nan)
+
+        return self._c / (self.count - ddof)
+
+
+    def correlation(self) -> np.ndarray:
+        """ Correlation of each column with the benchmark over the window
+
+        Returns:
+            np.ndarray: correlations
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._c / np.sqrt(np.maximum(self._m2_x, 0) * np.maximum(self._m2_y, 0))
+
+
+    def beta(self) -> np.ndarray:
+        """ Slope of the least squares regression of each column on the benchmark
+
+        Returns:
+            np.ndarray: betas
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._c / self._m2_y
+
+
+    def alpha(self) -> np.ndarray:
+        """ Intercept of the least squares regression of each column on the benchmark
+
+        Returns:
+            np.ndarray: alphas
+        """
+        return self.mean_x - self.beta() * self.mean_y
+
+
+class RunningDrawdown:
+    def __init__(self):
+        """ Initializes a running drawdown of many columns, from the running maximum of their growth
+            Same drawdowns as max_drawdown, updated in O(1) per bar
+        """
+        self.count = 0
+        self.growth = 1.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+
+
+    def update(self, returns: Union[float, np.ndarray]) -> None:
+        """ Adds bars of returns to the accumulator
+
+        Args:
+            returns (Union[float, np.ndarray]): one bar (columns,) or a block of bars (bars, columns)
+        """
+        returns = _as_bars(returns)
+        if len(returns) == 0:
+            return
+
+        if len(returns) == 1:
+            self.growth = self.growth * (1 + returns[0])
+            self.peak = np.maximum(self.peak, self.growth)
+            self.max_drawdown = np.minimum(self.max_drawdown, (self.growth - self.peak) / self.peak)
+            self.count += 1
+            return
+
+        growth = self.growth * np.cumprod(1 + returns, axis=0)
+        peak = np.maximum(self.peak, np.maximum.accumulate(growth, axis=0))
+
+        self.max_drawdown = np.minimum(self.max_drawdown, ((growth - peak) / peak).min(axis=0))
+        self.growth = growth[-1]
+        self.peak = peak[-1]
+        self.count += len(returns)
+
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """ Current drawdown of each column from its peak
+        """
+        return (self.growth - self.peak) / self.peak
+
+
+def _window_means(values: np.ndarray, window: int) -> np.ndarray:
+    # mean over the window ending at each bar from one cumulative sum, NaN before the window is full
+    sums = np.cumsum(values, axis=0)
+    counts = np.arange(1, len(values)+1)[:, None]
+    if window is None:
+        return sums / counts
+
+    sums = np.concatenate([sums[:window], sums[window:] - sums[:-window]])
+    means = sums / np.minimum(counts, window)
+    means[:window-1] = np.nan
+
+    return means
+
+
+def rolling_moments(values: np.ndarray, window: int=None, ddof: int=0) -> Tuple[np.ndarray, np.ndarray]:
+    """ Mean and variance of many columns at every bar, over a rolling window or expanding
+
+    Args:
+        values (np.ndarray): values without missing values (bars,) or (bars, columns)
+        window (int, optional): bars in the window. Defaults to None (expanding).
+        ddof (int, optional): delta degrees of freedom. Defaults to 0.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: mean and variance (bars, columns), NaN before the window is full
+    """
+    values = _as_columns(values)
+    # centered values keep the sums of squares accurate
+    shift = values.mean(axis=0)
+    mean = _window_means(values - shift, window)
+    variance = np.maximum(_window_means((values - shift)**2, window) - mean**2, 0)
+
+    counts = np.arange(1, len(values)+1)[:, None]
+    if window is not None:
+        counts = np.minimum(counts, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(counts > ddof, variance * counts / (counts - ddof), np.nan)
+
+    return mean + shift, variance
+
+
+def rolling_beta(x: np.ndarray, y: np.ndarray, window: int=None) -> Tuple[np.ndarray, np.ndarray]:
+    """ Least squares alpha and beta of many columns on a benchmark at every bar,
+        over a rolling window or expanding
+
+    Args:
+        x (np.ndarray): values without missing values (bars,) or (bars, columns)
+        y (np.ndarray): benchmark, same shape as x or one column for all of x
+        window (int, optional): bars in the window. Defaults to None (expanding).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: alpha and beta (bars, columns), NaN before the window is full
+    """
+    x = _as_columns(x)
+    y = np.broadcast_to(_as_columns(y), x.shape)
+    # centered values keep the sums of products accurate
+    x_shift = x.mean(axis=0)
+    y_shift = y.mean(axis=0)
+    x = x - x_shift
+    y = y - y_shift
+
+    mean_x = _window_means(x, window)
+    mean_y = _window_means(y, window)
+    covariance = _window_means(x * y, window) - mean_x * mean_y
+    variance_y = _window_means(y**2, window) - mean_y**2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = covariance / variance_y
+
+    return (mean_x + x_shift) - beta * (mean_y + y_shift), beta
+
+
+def running_drawdown(returns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Drawdown and max drawdown so far of many columns at every bar
+
+    Args:
+        returns (np.ndarray): returns without missing values (bars,) or (bars, columns)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: drawdown and max drawdown so far (bars, columns)
+    """
+    growth = np.cumprod(1 + _as_columns(returns), axis=0)
+    peak = np.maximum.accumulate(growth, axis=0)
+    drawdown = (growth - peak) / peak
+
+    return drawdown, np.minimum.accumulate(drawdown, axis=0)
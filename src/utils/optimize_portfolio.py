@@ -1,50 +1,131 @@
 import numpy as np
 from scipy.optimize import minimize
+from scipy.linalg import cho_factor, cho_solve, LinAlgError
 from typing import Tuple
 
+def _tangency_weights(expected_returns: np.array, cov_matrix: np.array, risk_free_rate: float) -> np.array:
+    # closed form tangent portfolio, sigma^-1 (mu - rf) normalized to sum to 1
+    try:
+        z = cho_solve(cho_factor(cov_matrix), expected_returns - risk_free_rate)
+    except LinAlgError:
+        return None
+
+    # a non-positive sum is the minimum sharpe ratio solution, not the tangent portfolio
+    if np.sum(z) <= 0:
+        return None
+
+    return z / np.sum(z)
+
+
+def _neg_sharpe_ratio(weights, expected_returns, cov_matrix, risk_free_rate):
+    portfolio_return = np.dot(weights, expected_returns)
+    portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
+    return -(portfolio_return - risk_free_rate) / portfolio_volatility
+
+
+def _neg_sharpe_ratio_grad(weights, expected_returns, cov_matrix, risk_free_rate):
+    cov_weights = np.dot(cov_matrix, weights)
+    portfolio_variance = np.dot(weights, cov_weights)
+    portfolio_volatility = np.sqrt(portfolio_variance)
+    excess_return = np.dot(weights, expected_returns) - risk_free_rate
+    return -(expected_returns / portfolio_volatility - excess_return * cov_weights / portfolio_variance**1.5)
+
+
+def _long_only_tangency(
+    excess_returns: np.array,
+    cov_matrix: np.array,
+    initial_weights: np.array
+) -> np.array:
+    # max sharpe with w >= 0 is the convex QP: min y'Sy s.t. (mu - rf)'y = 1, y >= 0, w = y/sum(y)
+    initial_excess = np.dot(initial_weights, excess_returns)
+    initial_guess = initial_weights / initial_excess if initial_excess > 0 else initial_weights
+
+    results = minimize(
+        lambda y: np.dot(y, np.dot(cov_matrix, y)),
+        initial_guess,
+        jac=lambda y: 2*np.dot(cov_matrix, y),
+        method='SLSQP',
+        bounds=[(0, None)] * len(excess_returns),
+        constraints={
+            'type': 'eq',
+            'fun': lambda y: np.dot(excess_returns, y) - 1,
+            'jac': lambda y: excess_returns
+        },
+        options={'ftol': 1e-12}
+    )
+
+    if not results.success or np.sum(results.x) <= 0:
+        return None
+
+    return results.x / np.sum(results.x)
+
+
 def optimize_portfolio(
-    expected_returns: np.array, 
-    cov_matrix: np.array, 
+    expected_returns: np.array,
+    cov_matrix: np.array,
     risk_free_rate: float,
-    bounds: list=None
+    bounds: list=None,
+    initial_weights: np.array=None,
 ) -> Tuple[np.array, float]:
     """ Finds tangent portfolio using Modern Portfolio Theory
+        Uses the closed form solution when no bound is active, a quadratic program
+        for long-only bounds and SLSQP with analytic gradients otherwise
 
     Args:
         expected_returns (np.array): expected returns of assets in portfolio
         cov_matrix (np.array): covariance matrix of assets in portfolio
         risk_free_rate (float): risk free rate
-        bounds (list, optional): constraints on each weight (min, max). Defaults to None.
+        bounds (list, optional): constraints on each weight (min, max), None for no limit.
+            Defaults to None (0, 1) for each weight (no short selling).
+        initial_weights (np.array, optional): starting point, e.g. last period's weights.
+            Defaults to None (equal weights).
 
     Returns:
         Tuple[np.array, float]: weights of assets in portfolio, expected return of portfolio
     """
+    expected_returns = np.asarray(expected_returns, dtype=float)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
     n_assets = len(expected_returns)
-    
-    # objective function
-    def neg_sharpe_ratio(weights, expected_returns, cov_matrix, risk_free_rate):
-        portfolio_return = np.dot(weights, expected_returns)
-        portfolio_volatility = np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights)))
-        sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_volatility
-        return -sharpe_ratio
 
-    # weights need to sum to 1
-    constraints = {'type': 'eq', 'fun': lambda x: np.sum(x) - 1}
+    # weights must be between 0 and 1 (no short selling) by default
+    if bounds is None:
+        bounds = [(0, 1)] * n_assets
+    lower = np.array([-np.inf if b[0] is None else b[0] for b in bounds], dtype=float)
+    upper = np.array([np.inf if b[1] is None else b[1] for b in bounds], dtype=float)
 
-    # weights must be between 0 and 1 (no short selling)
-    bounds = [(0, 1)] * n_assets
+    # closed form solution is optimal if it does not hit any bounds
+    weights = _tangency_weights(expected_returns, cov_matrix, risk_free_rate)
+    if weights is not None and np.all(weights >= lower) and np.all(weights <= upper):
+        return weights, np.dot(weights, expected_returns)
 
     # initial guess
-    initial_guess = [1/n_assets] * n_assets
+    if initial_weights is None:
+        initial_guess = np.full(n_assets, 1/n_assets)
+    else:
+        initial_guess = np.clip(np.asarray(initial_weights, dtype=float), lower, upper)
 
-    # minimize negative sharpe ratio (maximize sharpe ratio)
+    # long only, no upper limit below 1
+    if np.all(lower == 0) and np.all(upper >= 1):
+        excess_returns = expected_returns - risk_free_rate
+        if np.any(excess_returns > 0):
+            weights = _long_only_tangency(excess_returns, cov_matrix, initial_guess)
+            if weights is not None:
+                return weights, np.dot(weights, expected_returns)
+
+    # minimize negative sharpe ratio (maximize sharpe ratio), weights need to sum to 1
     results = minimize(
-        neg_sharpe_ratio,
+        _neg_sharpe_ratio,
         initial_guess,
         args=(expected_returns, cov_matrix, risk_free_rate),
+        jac=_neg_sharpe_ratio_grad,
         method='SLSQP',
         bounds=bounds,
-        constraints=constraints
+        constraints={
+            'type': 'eq',
+            'fun': lambda x: np.sum(x) - 1,
+            'jac': lambda x: np.ones_like(x)
+        },
+        options={'ftol': 1e-12}
     )
-    
-    return results.x, np.dot(results.x, expected_returns)
\ No newline at end of file
+
+    return results.x, np.dot(results.x, expected_returns)
@@ -0,0 +1,252 @@
+import os
+import json
+import yfinance as yf
+import pandas as pd
+from datetime import date
+from functools import lru_cache
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USLaborDay, USMartinLutherKingJr,
+    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+from pandas.tseries.offsets import CustomBusinessDay
+from typing import Callable, Dict, List, Tuple
+
+class _ExchangeHolidayCalendar(AbstractHolidayCalendar):
+    # regular NYSE holidays, to tell closed days from failed downloads
+    rules = [
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+@lru_cache(maxsize=1)
+def _trading_day() -> CustomBusinessDay:
+    return CustomBusinessDay(calendar=_ExchangeHolidayCalendar())
+
+
+def _has_trading_days(start: pd.Timestamp, end: pd.Timestamp) -> bool:
+    # any weekday that is not a holiday in [start, end)
+    return len(pd.date_range(start, end - pd.Timedelta(days=1), freq=_trading_day())) > 0
+
+
+def download_adj_close(tickers: list, start_date: str, end_date: str, period: str='1d') -> pd.DataFrame:
+    """Downloads adjusted close prices from Yahoo Finance
+
+    Args:
+        tickers (list): list of stock tickers
+        start_date (str): start date (inclusive)
+        end_date (str): end date (exclusive)
+        period (str, optional): data interval. Defaults to '1d'.
+
+    Returns:
+        pd.DataFrame: adjusted close prices (dates, tickers)
+    """
+    data = yf.download(tickers, start=start_date, end=end_date, period=period)['Adj Close']
+
+    # single ticker downloads can come back as a series
+    if isinstance(data, pd.Series):
+        data = data.to_frame(tickers[0])
+
+    return data
+
+
+class PriceCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        period: str='1d',
+        offline: bool=False,
+        downloader: Callable=download_adj_close,
+    ):
+        """ Initializes an on-disk cache of historical prices
+            Prices are stored as one parquet file per ticker, along with a
+            manifest of the date ranges that have already been fetched
+
+        Args:
+            cache_dir (str): folder to store the cached prices in
+            period (str, optional): data interval. Defaults to '1d'.
+            offline (bool, optional): never download, only read cached prices. Defaults to False.
+            downloader (Callable, optional): function(tickers, start_date, end_date, period) -> pd.DataFrame
+                used to fetch missing prices. Defaults to download_adj_close.
+        """
+        self.cache_dir = os.path.join(cache_dir, period)
+        self.period = period
+        self.offline = offline
+        self.downloader = downloader
+        self._manifest_path = os.path.join(self.cache_dir, 'coverage.json')
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.coverage = self._load_manifest()
+
+
+    def _load_manifest(self) -> Dict[str, List[List[str]]]:
+        if not os.path.exists(self._manifest_path):
+            return {}
+
+        with open(self._manifest_path, 'r') as f:
+            return json.load(f)
+
+
+    def _save_manifest(self) -> None:
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.coverage, f, indent=4)
+        os.replace(tmp_path, self._manifest_path)
+
+
+    def _ticker_path(self, ticker: str) -> str:
+        return os.path.join(self.cache_dir, f'{ticker}.parquet')
+
+
+    def _read_ticker(self, ticker: str) -> pd.Series:
+        path = self._ticker_path(ticker)
+        if not os.path.exists(path):
+            return pd.Series(dtype=float, name=ticker, index=pd.DatetimeIndex([]))
+
+        return pd.read_parquet(path)['Adj Close'].rename(ticker)
+
+
+    def _write_ticker(self, ticker: str, prices: pd.Series) -> None:
+        prices = prices.rename('Adj Close').to_frame()
+        prices.index.name = 'Date'
+        prices.to_parquet(self._ticker_path(ticker))
+
+
+    def missing_ranges(self, ticker: str, start_date: str, end_date: str) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """ Finds the date ranges of a request that are not in the cache
+
+        Args:
+            ticker (str): stock ticker
+            start_date (str): start date (inclusive)
+            end_date (str): end date (exclusive)
+
+        Returns:
+            List[Tuple[pd.Timestamp, pd.Timestamp]]: [start, end) ranges that still need to be fetched
+        """
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        gaps = []
+
+        for covered_start, covered_end in self.coverage.get(ticker, []):
+            covered_start = pd.Timestamp(covered_start)
+            covered_end = pd.Timestamp(covered_end)
+
+            if covered_end <= start:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > start:
+                gaps.append((start, covered_start))
+            start = max(start, covered_end)
+
+        if start < end:
+            gaps.append((start, end))
+
+        return gaps
+
+
+    def _add_coverage(self, ticker: str, start: pd.Timestamp, end: pd.Timestamp) -> None:
+        ranges = [
+            (pd.Timestamp(s), pd.Timestamp(e)) for s, e in self.coverage.get(ticker, [])
+        ]
+        ranges.append((start, end))
+        ranges.sort()
+
+        # merge overlapping and adjacent ranges
+        merged = [ranges[0]]
+        for s, e in ranges[1:]:
+            if s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+
+        self.coverage[ticker] = [
+            [s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')] for s, e in merged
+        ]
+
+
+    def update(self, tickers: list, start_date: str, end_date: str) -> None:
+        """ Downloads the prices that are missing from the cache and merges them in
+            Tickers missing the same date range are downloaded together. Only past days are
+            marked as covered, for tickers that returned prices and for ranges without trading days
+
+        Args:
+            tickers (list): list of stock tickers
+            start_date (str): start date (inclusive)
+            end_date (str): end date (exclusive)
+        """
+        # today's bar is still moving, only mark completed days as covered
+        today = pd.Timestamp(date.today())
+        end_date = min(pd.Timestamp(end_date).normalize(), today)
+
+        requests = {}
+        for ticker in tickers:
+            for gap in self.missing_ranges(ticker, start_date, end_date):
+                requests.setdefault(gap, []).append(ticker)
+
+        for (start, end), gap_tickers in requests.items():
+            # weekends and holidays have nothing to download
+            if not _has_trading_days(start, end):
+                for ticker in gap_tickers:
+                    self._add_coverage(ticker, start, end)
+                self._save_manifest()
+                continue
+
+            data = self.downloader(
+                gap_tickers,
+                start.strftime('%Y-%m-%d'),
+                end.strftime('%Y-%m-%d'),
+                self.period
+            )
+
+            for ticker in gap_tickers:
+                # a failed request or a ticker missing from the batch is tried again next time
+                new = data[ticker].dropna() if ticker in data.columns else None
+                if new is None or new.empty:
+                    continue
+
+                cached = self._read_ticker(ticker)
+                if not cached.empty:
+                    new = pd.concat([cached[~cached.index.isin(new.index)], new]).sort_index()
+                self._write_ticker(ticker, new)
+                self._add_coverage(ticker, start, end)
+
+            # save progress after every download
+            self._save_manifest()
+
+
+    def get(self, tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+        """ Gets historical prices, only downloading the ranges missing from the cache
+
+        Args:
+            tickers (list): list of stock tickers
+            start_date (str): start date (inclusive)
+            end_date (str): end date (exclusive)
+
+        Returns:
+            pd.DataFrame: historical prices of the stocks (dates, tickers)
+        """
+        if not self.offline:
+            self.update(tickers, start_date, end_date)
+
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+
+        prices = []
+        for ticker in tickers:
+            cached = self._read_ticker(ticker)
+            prices.append(cached[(cached.index >= start) & (cached.index < end)])
+
+        data = pd.concat(prices, axis=1).sort_index()
+        data.index.name = 'Date'
+        data.columns.name = 'Ticker'
+
+        return data.reindex(columns=tickers)
@@ -0,0 +1,152 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Union
+
+class PricePanel:
+    def __init__(self, path: str, mode: str='r'):
+        """ Opens a memory-mapped (dates, tickers) panel of prices and returns
+            created with PricePanel.from_frame(). Data is only read from disk
+            for the rows and columns that are accessed
+
+        Args:
+            path (str): folder containing the panel files
+            mode (str, optional): memmap mode, 'r' for read only or 'r+' for read/write. Defaults to 'r'.
+        """
+        self.path = path
+        self.mode = mode
+
+        with open(os.path.join(path, 'tickers.json'), 'r') as f:
+            self.tickers = json.load(f)
+
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')), name='Date')
+        self.prices = np.load(os.path.join(path, 'prices.npy'), mmap_mode=mode)
+        self.returns = np.load(os.path.join(path, 'returns.npy'), mmap_mode=mode)
+        self._ticker_loc = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+
+    def __getstate__(self) -> dict:
+        # pickled by path, so process workers map the files instead of receiving a copy
+        return {'path': self.path, 'mode': self.mode}
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['path'], state['mode'])
+
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, path: str, dtype: np.dtype=np.float32) -> 'PricePanel':
+        """ Writes a price dataframe to disk as a memory-mapped panel
+            Daily returns are precomputed and stored alongside the prices
+
+        Args:
+            data (pd.DataFrame): historical prices (dates, tickers)
+            path (str): folder to store the panel in
+            dtype (np.dtype, optional): dtype of the stored prices and returns. Defaults to np.float32.
+
+        Returns:
+            PricePanel: read only panel backed by the written files
+        """
+        os.makedirs(path, exist_ok=True)
+        data = data.sort_index()
+
+        with open(os.path.join(path, 'tickers.json'), 'w') as f:
+            json.dump([str(ticker) for ticker in data.columns], f)
+        np.save(os.path.join(path, 'dates.npy'), data.index.values.astype('datetime64[ns]'))
+
+        prices = np.lib.format.open_memmap(
+            os.path.join(path, 'prices.npy'), mode='w+', dtype=dtype, shape=data.shape
+        )
+        returns = np.lib.format.open_memmap(
+            os.path.join(path, 'returns.npy'), mode='w+', dtype=dtype, shape=data.shape
+        )
+
+        # returns are computed in float64 before casting down
+        values = data.to_numpy(dtype=np.float64)
+        prices[:] = values
+        returns[0] = np.nan
+        returns[1:] = values[1:] / values[:-1] - 1
+
+        prices.flush()
+        returns.flush()
+        del prices, returns
+
+        return cls(path)
+
+
+    def window(self, start_date: str=None, end_date: str=None) -> slice:
+        """ Gets the row positions of a date window
+
+        Args:
+            start_date (str, optional): first date of the window (inclusive). Defaults to None.
+            end_date (str, optional): last date of the window (inclusive). Defaults to None.
+
+        Returns:
+            slice: rows of the window
+        """
+        return self.dates.slice_indexer(start_date, end_date)
+
+
+    def _columns(self, tickers: list) -> Union[slice, list]:
+        if tickers is None:
+            return slice(None)
+
+        return [self._ticker_loc[ticker] for ticker in tickers]
+
+
+    def get_prices(self, start_date: str=None, end_date: str=None, tickers: list=None) -> np.ndarray:
+        """ Gets prices for a date window. Without tickers the result is a zero-copy view
+
+        Args:
+            start_date (str, optional): first date of the window (inclusive). Defaults to None.
+            end_date (str, optional): last date of the window (inclusive). Defaults to None.
+            tickers (list, optional): subset of tickers, copies the selected columns. Defaults to None.
+
+        Returns:
+            np.ndarray: prices (dates, tickers)
+        """
+        return self.prices[self.window(start_date, end_date)][:, self._columns(tickers)]
+
+
+    def get_returns(self, start_date: str=None, end_date: str=None, tickers: list=None) -> np.ndarray:
+        """ Gets precomputed daily returns for a date window. Without tickers the result is a zero-copy view
+
+        Args:
+            start_date (str, optional): first date of the window (inclusive). Defaults to None.
+            end_date (str, optional): last date of the window (inclusive). Defaults to None.
+            tickers (list, optional): subset of tickers, copies the selected columns. Defaults to None.
+
+        Returns:
+            np.ndarray: daily returns (dates, tickers)
+        """
+        return self.returns[self.window(start_date, end_date)][:, self._columns(tickers)]
+
+
+    def to_frame(
+        self,
+        start_date: str=None,
+        end_date: str=None,
+        tickers: list=None,
+        returns: bool=False
+    ) -> pd.DataFrame:
+        """ Wraps a date window of the panel in a dataframe without copying the data
+
+        Args:
+            start_date (str, optional): first date of the window (inclusive). Defaults to None.
+            end_date (str, optional): last date of the window (inclusive). Defaults to None.
+            tickers (list, optional): subset of tickers. Defaults to None.
+            returns (bool, optional): return daily returns instead of prices. Defaults to False.
+
+        Returns:
+            pd.DataFrame: prices or returns (dates, tickers)
+        """
+        rows = self.window(start_date, end_date)
+        source = self.returns if returns else self.prices
+
+        return pd.DataFrame(
+            source[rows][:, self._columns(tickers)],
+            index=self.dates[rows],
+            columns=self.tickers if tickers is None else tickers,
+            copy=False
+        )
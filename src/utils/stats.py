@@ -1,11 +1,15 @@
 import pandas as pd
 import numpy as np
+from typing import Tuple
+from joblib import Parallel, delayed, effective_n_jobs
 from sklearn.decomposition import PCA
 from statsmodels.api import add_constant, OLS
 from statsmodels.tsa.arima.model import ARIMA
 from pmdarima.arima import auto_arima
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
+from scipy import stats as sp_stats
+from scipy.linalg import solve_triangular
 
 
 def pca(returns_df: pd.DataFrame) -> dict:
@@ -71,6 +75,95 @@ def fit_regression(
         'mse': model.mse_resid
     }
     
+
+def fit_regression_batch(
+    x: pd.DataFrame,
+    y: pd.DataFrame,
+    add_intercept: bool=True,
+) -> dict:
+    """Fits one linear regression per column of y against the same regressors
+        Columns with the same missing rows are solved together with a single QR factorization
+
+    Args:
+        x (pd.DataFrame): independent variables, shared by every regression (n_samples, n_features)
+        y (pd.DataFrame): dependent variables, one regression per column (n_samples, n_assets)
+        add_intercept (bool, optional): add y-intercept to fit. Defaults to True.
+
+    Raises:
+        ValueError: if the indexes of x and y are not the same rows, as in statsmodels' OLS
+
+    Returns:
+        dict: model parameters and statistics, one column/entry per asset
+    """
+    # rows are matched by position, so labelled inputs must line up
+    if isinstance(x, (pd.Series, pd.DataFrame)) and isinstance(y, (pd.Series, pd.DataFrame)):
+        if not x.index.equals(y.index):
+            raise ValueError('The indices of x and y are not aligned')
+    
+    if add_intercept:
+        x = add_constant(x)
+    x = pd.DataFrame(x)
+    y = pd.DataFrame(y)
+    
+    x_values = x.to_numpy(dtype=float)
+    y_values = y.to_numpy(dtype=float)
+    n_params = x_values.shape[1]
+    n_assets = y_values.shape[1]
+    
+    params = np.full((n_params, n_assets), np.nan)
+    bse = np.full((n_params, n_assets), np.nan)
+    mse = np.full(n_assets, np.nan)
+    r_squared = np.full(n_assets, np.nan)
+    dof = np.full(n_assets, np.nan)
+    residuals = np.full(y_values.shape, np.nan)
+    
+    # group assets by which rows are usable
+    valid = ~np.isnan(y_values) & ~np.isnan(x_values).any(axis=1)[:, None]
+    patterns, groups = np.unique(valid.T, axis=0, return_inverse=True)
+    
+    for g, rows in enumerate(patterns):
+        cols = np.flatnonzero(groups.ravel() == g)
+        n_obs = rows.sum()
+        if n_obs <= n_params:
+            continue
+        
+        x_g = x_values[rows]
+        y_g = y_values[rows][:, cols]
+        q, r = np.linalg.qr(x_g)
+        beta = solve_triangular(r, q.T @ y_g)
+        resid = y_g - x_g @ beta
+        
+        ssr = (resid**2).sum(axis=0)
+        df_resid = n_obs - n_params
+        if add_intercept:
+            tss = ((y_g - y_g.mean(axis=0))**2).sum(axis=0)
+        else:
+            tss = (y_g**2).sum(axis=0)
+        
+        # diagonal of (X'X)^-1 from the inverse of R
+        r_inv = solve_triangular(r, np.eye(n_params))
+        xtx_inv_diag = (r_inv**2).sum(axis=1)
+        
+        params[:, cols] = beta
+        mse[cols] = ssr / df_resid
+        r_squared[cols] = 1 - ssr / tss
+        bse[:, cols] = np.sqrt(np.outer(xtx_inv_diag, mse[cols]))
+        dof[cols] = df_resid
+        residuals[np.ix_(rows, cols)] = resid
+    
+    t_values = params / bse
+    p_values = 2 * sp_stats.t.sf(np.abs(t_values), dof)
+    
+    return {
+        'params': pd.DataFrame(params, index=x.columns, columns=y.columns),
+        'r_squared': pd.Series(r_squared, index=y.columns),
+        'residuals': pd.DataFrame(residuals, index=y.index, columns=y.columns),
+        't_values': pd.DataFrame(t_values, index=x.columns, columns=y.columns),
+        'p_values': pd.DataFrame(p_values, index=x.columns, columns=y.columns),
+        'mse': pd.Series(mse, index=y.columns)
+    }
+    
+    
 def forecast_arima(data: pd.Series) -> dict:
     """Finds best order for ARIMA model and forecasts 1 step ahead
 
@@ -99,31 +192,103 @@ def forecast_arima(data: pd.Series) -> dict:
     }
 
 
-def cluster_kmeans(data: pd.DataFrame, max_clusters: int) -> dict:
+def _simplified_silhouette(data: np.ndarray, labels: np.ndarray, centers: np.ndarray) -> float:
+    # silhouette using distances to cluster centers instead of all pairwise distances
+    distances = np.linalg.norm(data[:, None, :] - centers[None, :, :], axis=2)
+    rows = np.arange(len(data))
+    a = distances[rows, labels]
+    distances[rows, labels] = np.inf
+    b = distances.min(axis=1)
+    
+    denom = np.maximum(a, b)
+    scores = np.divide(b - a, denom, out=np.zeros_like(a), where=denom > 0)
+    
+    return scores.mean()
+
+
+def _fit_kmeans(
+    data: np.ndarray, 
+    k: int, 
+    minibatch: bool, 
+    silhouette: str, 
+    sample_size: int
+) -> Tuple[float, float, np.ndarray]:
+    if minibatch:
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=0, n_init=3)
+    else:
+        kmeans = KMeans(n_clusters=k, random_state=0)
+    labels = kmeans.fit_predict(data)
+    
+    if silhouette == 'simplified':
+        s_s = _simplified_silhouette(data, labels, kmeans.cluster_centers_)
+    elif silhouette == 'sampled' and len(data) > sample_size:
+        s_s = silhouette_score(data, labels, sample_size=sample_size, random_state=0)
+    else:
+        s_s = silhouette_score(data, labels)
+        
+    return kmeans.inertia_, s_s, labels
+
+
+def cluster_kmeans(
+    data: pd.DataFrame, 
+    max_clusters: int,
+    minibatch: bool=False,
+    silhouette: str='full',
+    sample_size: int=1000,
+    patience: int=None,
+    n_jobs: int=1,
+) -> dict:
     """Clusters data using KMeans and returns the optimal fit and silhouette scores
+        The defaults fit every k with a full silhouette score. For large data, 
+        use minibatch, a sampled/simplified silhouette and early stopping
 
     Args:
         data (pd.DataFrame): cluster data (n_samples, n_features)
         max_clusters (int): maximum number of clusters to test
+        minibatch (bool, optional): fit with MiniBatchKMeans. Defaults to False.
+        silhouette (str, optional): silhouette score to use. 'full', 'sampled' (sample_size points) 
+            or 'simplified' (distances to cluster centers). Defaults to 'full'.
+        sample_size (int, optional): number of points for the sampled silhouette. Defaults to 1000.
+        patience (int, optional): stop after this many k without a better silhouette score. Defaults to None.
+        n_jobs (int, optional): number of k to fit in parallel. Defaults to 1.
 
     Returns:
         dict: inertias, silhouette scores, optimal cluster and labels
     """
+    data = np.asarray(data, dtype=float)
     silhouette_scores = []
     inertias = []
+    since_best = 0
     
-    for k in range(2, max_clusters+1):
-        kmeans = KMeans(n_clusters=k, random_state=0)
-        labels = kmeans.fit_predict(data)
-        inertias.append(kmeans.inertia_)
-        s_s = silhouette_score(data, labels)
-        
-        # update clusters if silhouette score is higher
-        if not silhouette_scores or s_s > max(silhouette_scores):
-            optimal_labels = labels
-            optimal_clusters = k
+    k_values = list(range(2, max_clusters+1))
+    batch_size = effective_n_jobs(n_jobs)
+    
+    with Parallel(n_jobs=n_jobs, prefer='threads') as parallel:
+        for i in range(0, len(k_values), batch_size):
+            batch = k_values[i:i+batch_size]
+            results = parallel(
+                delayed(_fit_kmeans)(data, k, minibatch, silhouette, sample_size) for k in batch
+            )
+            
+            for k, (inertia, s_s, labels) in zip(batch, results):
+                inertias.append(inertia)
+                
+                # update clusters if silhouette score is higher
+                if not silhouette_scores or s_s > max(silhouette_scores):
+                    optimal_labels = labels
+                    optimal_clusters = k
+                    since_best = 0
+                else:
+                    since_best += 1
+                
+                silhouette_scores.append(s_s)
+                
+                # results past the stopping point are discarded so n_jobs does not change the output
+                if patience is not None and since_best >= patience:
+                    break
             
-        silhouette_scores.append(s_s)
+            if patience is not None and since_best >= patience:
+                break
         
     return {
         'inertias': inertias,
@@ -1,12 +1,30 @@
-import pandas as pd 
+import pandas as pd
+from typing import Union
+
+def resample_returns(
+    data: Union[pd.Series, pd.DataFrame],
+    freq: str='ME'
+) -> Union[pd.Series, pd.DataFrame]:
+    """Compounds returns to a lower frequency with a grouped product over all columns at once
+        Missing values are skipped, periods with no data are NaN.
+
+    Args:
+        data (Union[pd.Series, pd.DataFrame]): returns (in decimals) with a datetime index
+        freq (str, optional): target frequency (W, ME, QE, YE). Defaults to 'ME'.
+
+    Returns:
+        Union[pd.Series, pd.DataFrame]: compounded returns (in decimals)
+    """
+    return (1 + data).resample(freq).prod(min_count=1) - 1
+
 
 def daily_to_monthly(df: pd.DataFrame) -> pd.DataFrame:
     """Converts daily data to monthly data
-    
+
     Args:
         df (pd.DataFrame): daily returns (in decimals)
-    
+
     Returns:
         pd.DataFrame: monthly data (in decimals)
     """
-    return df.resample('ME').apply(lambda x: (1 + x).prod() - 1)
\ No newline at end of file
+    return resample_returns(df, 'ME')